@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Cold-start report based on `python -X importtime`.
+
+Imports a module (run_dashboard by default) in a fresh interpreter and prints
+the total import time plus the slowest modules by cumulative and self time.
+With --ready it also times how long create_server() takes, i.e. the full
+cold start of a Gunicorn worker including loading models and data.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into a list of (module, self_us, cumulative_us, depth)"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_part, cumulative_part, name = line.split('|', 2)
+        self_us = int(self_part.split(':')[1])
+        # One space follows the separator, then two per nesting level
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        rows.append((name.strip(), self_us, int(cumulative_part), depth))
+    return rows
+
+
+def import_report(module='run_dashboard', statement=None):
+    """Import module in a fresh interpreter and summarize where the time went"""
+    code = statement or f'import {module}'
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-W', 'ignore', '-c', code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    wall_seconds = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    rows = parse_importtime(proc.stderr)
+    # Top-level entries (depth 0) add up to the total import time
+    total_us = sum(cumulative for _, _, cumulative, depth in rows if depth == 0)
+    return {
+        'statement': code,
+        'wall_seconds': round(wall_seconds, 4),
+        'import_seconds': round(total_us / 1e6, 4),
+        'modules': len(rows),
+        'heavy_modules_loaded': sorted({name.split('.')[0] for name, *_ in rows} &
+                                       {'sklearn', 'scipy', 'plotly', 'dash', 'flask', 'pandas'}),
+        'top_cumulative': sorted(((name, cumulative) for name, _, cumulative, _ in rows),
+                                 key=lambda r: -r[1]),
+        'top_self': sorted(((name, self_us) for name, self_us, _, _ in rows), key=lambda r: -r[1])
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='run_dashboard', help='module to import (default run_dashboard)')
+    parser.add_argument('--ready', action='store_true',
+                        help='also time run_dashboard.create_server() (models + data loaded)')
+    parser.add_argument('--top', type=int, default=15, help='number of modules to list')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    reports = [import_report(args.module)]
+    if args.ready:
+        reports.append(import_report(statement='import run_dashboard; run_dashboard.create_server()'))
+
+    for report in reports:
+        report['top_cumulative'] = report['top_cumulative'][:args.top]
+        report['top_self'] = report['top_self'][:args.top]
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+
+    for report in reports:
+        print(f"⏱️  {report['statement']}")
+        print(f"   wall: {report['wall_seconds']:.3f}s  imports: {report['import_seconds']:.3f}s  "
+              f"modules: {report['modules']}")
+        print(f"   heavy packages loaded: {', '.join(report['heavy_modules_loaded']) or 'none'}")
+        print(f"   {'slowest (cumulative)':<50}{'ms':>10}")
+        for name, us in report['top_cumulative']:
+            print(f"   {name:<50}{us / 1000:>10.1f}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Load test the Dash server with a replayed mix of callback requests.
+
+Starts `gunicorn -c gunicorn.conf.py run_dashboard:server` locally for every
+--workers x --threads combination and replays `_dash-update-component`
+requests against it: predict clicks plus crop and season dropdown changes,
+in the proportions given by --mix. Payloads are built from the server's
+/_dash-dependencies and the inputs are drawn from the served layout (dropdown
+options, area/year bounds), so the replay follows the dashboard as it is.
+
+The client is closed loop: --concurrency threads, spread over
+--client-processes so the client's GIL is not the bottleneck, each send
+their next request as soon as the previous one returns, for --duration
+seconds after a --warmup period. Throughput and p50/p95/p99 latency are
+reported per callback. The client runs on the same machine as the server,
+so only compare results measured on the same host. Everything runs offline
+on 127.0.0.1.
+
+    python benchmarks/load_test.py --workers 1 2 4 --threads 1 4 8
+    python benchmarks/load_test.py --mix predict=3,crop=1,season=1 --output load.json
+    python benchmarks/load_test.py --baseline load.json   # exits 1 on a >20% regression
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from worker_memory import PROJECT_ROOT, free_port, wait_until_up, child_pids
+
+# Replayed request kinds: the input each one changes in the browser
+CALLBACK_INPUTS = {
+    'predict': 'predict-button.n_clicks',
+    'crop': 'crop-dropdown.value',
+    'season': 'season-dropdown.value'
+}
+DEFAULT_MIX = 'predict=2,crop=1,season=1'
+
+
+def parse_mix(text):
+    """'predict=2,crop=1' -> {'predict': 2.0, 'crop': 1.0}"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in CALLBACK_INPUTS:
+            raise ValueError(f"Unknown request kind {name!r}; expected one of {list(CALLBACK_INPUTS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def split_output(output):
+    """Dash's output spec string as the 'outputs' field of a callback request"""
+    if output.startswith('..'):
+        return [dict(zip(('id', 'property'), spec.rsplit('.', 1))) for spec in output[2:-2].split('...')]
+    return dict(zip(('id', 'property'), output.rsplit('.', 1)))
+
+
+def find_props(layout, component_id):
+    """Props of the component with the given id in a serialized layout"""
+    stack = [layout]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if node.get('props', {}).get('id') == component_id:
+                return node['props']
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    raise KeyError(f"No component {component_id!r} in the layout")
+
+
+class Workload:
+    """Builds random callback requests for the served layout"""
+
+    def __init__(self, base, mix):
+        with urllib.request.urlopen(base + '/_dash-dependencies') as response:
+            dependencies = json.load(response)
+        with urllib.request.urlopen(base + '/_dash-layout') as response:
+            layout = json.load(response)
+
+        self.callbacks = {}
+        for name, prop_id in CALLBACK_INPUTS.items():
+            for dependency in dependencies:
+                inputs = [f"{i['id']}.{i['property']}" for i in dependency['inputs']]
+                if prop_id in inputs and not dependency.get('clientside_function'):
+                    self.callbacks[name] = dependency
+                    break
+        skipped = [name for name in mix if name not in self.callbacks]
+        if skipped:
+            # e.g. CLIENTSIDE_CHARTS: dropdown changes never reach the server
+            print(f"⚠️ No server-side callback for {skipped}; not replayed")
+        self.kinds = [name for name in mix if name in self.callbacks]
+        if not self.kinds:
+            raise RuntimeError('Nothing to replay')
+        self.weights = [mix[name] for name in self.kinds]
+
+        self.crops = [option['value'] for option in find_props(layout, 'crop-dropdown')['options']]
+        self.seasons = [option['value'] for option in find_props(layout, 'season-dropdown')['options']]
+        area, year = find_props(layout, 'area-input'), find_props(layout, 'year-input')
+        self.area_range = (area.get('min', 1), area.get('max', 1000))
+        self.year_range = (year.get('min', 2000), year.get('max', 2030))
+
+    def request(self, rng, clicks):
+        """(kind, JSON body) of one random callback request"""
+        kind = rng.choices(self.kinds, self.weights)[0]
+        dependency = self.callbacks[kind]
+        values = {
+            'predict-button.n_clicks': clicks,
+            'crop-dropdown.value': rng.choice(self.crops),
+            'season-dropdown.value': rng.choice(self.seasons),
+            'area-input.value': rng.randint(*self.area_range),
+            'year-input.value': rng.randint(*self.year_range)
+        }
+
+        def with_values(specs):
+            return [dict(spec, value=values.get(f"{spec['id']}.{spec['property']}")) for spec in specs]
+
+        body = {
+            'output': dependency['output'],
+            'outputs': split_output(dependency['output']),
+            'inputs': with_values(dependency['inputs']),
+            'changedPropIds': [CALLBACK_INPUTS[kind]],
+            'state': with_values(dependency['state'])
+        }
+        return kind, json.dumps(body).encode()
+
+
+def _client(port, workload, seed, stop_at, record_after, records):
+    """One closed-loop client thread on a keep-alive connection"""
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    clicks = 0
+    while True:
+        clicks += 1
+        kind, body = workload.request(rng, clicks)
+        now = time.time()
+        if now >= stop_at:
+            break
+        start = time.perf_counter()
+        try:
+            connection.request('POST', '/_dash-update-component', body=body,
+                               headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            ok = response.status in (200, 204)
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            ok = False
+        if now >= record_after:
+            records.append((kind, time.perf_counter() - start, ok))
+    connection.close()
+
+
+def _client_process(port, workload, seeds, stop_at, record_after):
+    """Run one client thread per seed and return their records"""
+    records = []
+    clients = [threading.Thread(target=_client, args=(port, workload, seed, stop_at, record_after, records))
+               for seed in seeds]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    return records
+
+
+def summarize(records, seconds):
+    """Throughput and latency percentiles of (kind, seconds, ok) records"""
+    def stats(rows):
+        latencies = np.array([latency for _, latency, ok in rows if ok]) * 1000.0
+        percentiles = np.percentile(latencies, [50, 95, 99]) if len(latencies) else [float('nan')] * 3
+        return {
+            'requests': len(rows),
+            'errors': sum(1 for _, _, ok in rows if not ok),
+            'throughput_rps': round(len(latencies) / seconds, 2),
+            'p50_ms': round(float(percentiles[0]), 3),
+            'p95_ms': round(float(percentiles[1]), 3),
+            'p99_ms': round(float(percentiles[2]), 3)
+        }
+
+    kinds = sorted({kind for kind, _, _ in records})
+    return stats(records), {kind: stats([r for r in records if r[0] == kind]) for kind in kinds}
+
+
+def run_config(workers, threads, mix, app, concurrency=None, client_processes=None,
+               duration=20.0, warmup=3.0, seed=0):
+    """Start Gunicorn with the given worker/thread counts, replay the mix and summarize"""
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    concurrency = concurrency or 2 * workers * threads
+    client_processes = min(client_processes or os.cpu_count() or 1, concurrency)
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(workers),
+         '--threads', str(threads), '--bind', f'127.0.0.1:{port}', app],
+        cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not wait_until_up(base + '/_dash-layout'):
+            raise RuntimeError('Gunicorn did not start')
+        deadline = time.time() + 120
+        while len(child_pids(proc.pid)) < workers and time.time() < deadline:
+            time.sleep(0.25)
+        workload = Workload(base, mix)
+
+        # Warm-up requests load the models and fill caches in every worker; not recorded
+        record_after = time.time() + warmup
+        stop_at = record_after + duration
+        seeds = [list(range(seed + i, seed + concurrency, client_processes)) for i in range(client_processes)]
+        with ProcessPoolExecutor(max_workers=client_processes) as pool:
+            futures = [pool.submit(_client_process, port, workload, process_seeds, stop_at, record_after)
+                       for process_seeds in seeds]
+            records = [record for future in futures for record in future.result()]
+
+        total, callbacks = summarize(records, duration)
+        return {
+            'workers': workers,
+            'threads': threads,
+            'concurrency': concurrency,
+            'client_processes': client_processes,
+            'duration_s': duration,
+            'mix': mix,
+            'total': total,
+            'callbacks': callbacks
+        }
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+def compare(results, baseline, threshold):
+    """Print regressions against a baseline run; returns how many were found"""
+    previous = {(r['workers'], r['threads']): r for r in baseline}
+    regressions = 0
+    for result in results:
+        old = previous.get((result['workers'], result['threads']))
+        if old is None:
+            continue
+        for kind, stats in result['callbacks'].items():
+            if kind not in old['callbacks']:
+                continue
+            before = old['callbacks'][kind]
+            slower = stats['p95_ms'] > before['p95_ms'] * (1 + threshold)
+            fewer = stats['throughput_rps'] < before['throughput_rps'] * (1 - threshold)
+            if slower or fewer:
+                regressions += 1
+                print(f"❌ {result['workers']}x{result['threads']} {kind}: "
+                      f"p95 {before['p95_ms']:.1f} -> {stats['p95_ms']:.1f} ms, "
+                      f"{before['throughput_rps']:.1f} -> {stats['throughput_rps']:.1f} req/s")
+    return regressions
+
+
+def print_table(results):
+    print(f"{'workers':>8}{'threads':>8}{'callback':>10}{'req/s':>10}{'p50 ms':>10}"
+          f"{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for result in results:
+        rows = list(result['callbacks'].items()) + [('all', result['total'])]
+        for kind, stats in rows:
+            print(f"{result['workers']:>8}{result['threads']:>8}{kind:>10}{stats['throughput_rps']:>10.1f}"
+                  f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[2])
+    parser.add_argument('--threads', type=int, nargs='+', default=[4])
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help=f'relative weights of the request kinds (default {DEFAULT_MIX})')
+    parser.add_argument('--concurrency', type=int,
+                        help='client threads (default 2 x workers x threads)')
+    parser.add_argument('--client-processes', type=int,
+                        help='processes the client threads are spread over (default: all cores)')
+    parser.add_argument('--duration', type=float, default=20.0, help='measured seconds per configuration')
+    parser.add_argument('--warmup', type=float, default=3.0, help='unrecorded seconds before measuring')
+    parser.add_argument('--app', default='run_dashboard:server', help='WSGI app for Gunicorn')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--baseline', help='results JSON of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed relative p95 increase / throughput drop (default 0.2 = 20%%)')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    results = []
+    for workers in args.workers:
+        for threads in args.threads:
+            print(f"⏱️  {workers} worker(s) x {threads} thread(s)...")
+            results.append(run_config(workers, threads, mix, args.app, concurrency=args.concurrency,
+                                      client_processes=args.client_processes,
+                                      duration=args.duration, warmup=args.warmup))
+    print()
+    print_table(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results saved to: {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n❌ {regressions} callback(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
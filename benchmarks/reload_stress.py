@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Stress CropPredictor with concurrent predictions while models reload.
+
+Two artifacts with different models are built from the synthetic benchmark
+fixture: the multi-output pipeline and the two-model layout, each with its
+own small prediction surface. One thread keeps calling load_models(),
+alternating between the two. Meanwhile --threads request threads call
+predict() and predict_batch(). Every single-row result must equal the
+expected output of one of the two artifacts, and every batch must match one
+artifact in full. A result mixing the models or surface of both (a
+half-finished reload), or an error, counts as a failure; the script exits
+1 if there is any.
+
+Predictions per second are reported per thread count, so the same run shows
+how in-process throughput scales with gthread threads during reloads.
+
+    python benchmarks/reload_stress.py [--threads 1 2 4 8 16] [--duration 5]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+from run_benchmarks import PROJECT_ROOT, build_fixture, quiet
+
+sys.path.insert(0, PROJECT_ROOT)
+
+# Small grid so the surfaces build in seconds; inputs fall inside and outside it
+SURFACE_YEARS = (2018, 2022)
+SURFACE_AREAS = (1, 200)
+RESULT_COLUMNS = ['predicted_yield', 'predicted_production', 'productivity']
+
+
+def build_artifacts(fixture):
+    """Save the fixture's multi-output and two-model layouts, each with a surface"""
+    from models.artifact import save_artifact, load_artifact
+    from models.model_trainer import ModelTrainer
+    from models.predictor import CropPredictor
+    from models.surface import build_surface, save_surface
+
+    processor, _, features, trainer = fixture
+    separate = ModelTrainer(processor)
+    with quiet():
+        separate.train_models(*features, multi_output=False)
+        predictor = CropPredictor(cache_size=0, micro_batch=False)
+
+    artifact_dirs = []
+    for source in (trainer, separate):
+        artifact_dir = tempfile.mkdtemp()
+        save_artifact(source.models_to_save(), artifact_dir)
+        predictor.models = load_artifact(artifact_dir)
+        values, meta = build_surface(predictor, year_range=SURFACE_YEARS, area_range=SURFACE_AREAS,
+                                     n_check=1000)
+        save_surface(values, meta, artifact_dir)
+        artifact_dirs.append(artifact_dir)
+    return artifact_dirs
+
+
+def make_inputs(processor, n_rows, seed=0):
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        'crop': rng.choice(processor.le_crop.classes_, n_rows),
+        'season': rng.choice(processor.le_season.classes_, n_rows),
+        'area': rng.randint(1, 400, n_rows).astype(float),
+        'year': rng.randint(2014, 2026, n_rows)
+    })
+
+
+def load(predictor, artifact_dir):
+    predictor.config.MODEL_ARTIFACT_DIR = artifact_dir
+    with quiet():
+        predictor.load_models()
+
+
+def expected_results(predictor, artifact_dirs, inputs):
+    """Per artifact: single-row results and the batch result array"""
+    expected = []
+    for artifact_dir in artifact_dirs:
+        load(predictor, artifact_dir)
+        if predictor.surface is None:
+            raise RuntimeError(f'No surface loaded from {artifact_dir}')
+        single = [tuple(predictor.predict(*row)[column] for column in RESULT_COLUMNS)
+                  for row in inputs.itertuples(index=False)]
+        batch = predictor.predict_batch(inputs)[RESULT_COLUMNS].to_numpy()
+        expected.append((single, batch))
+    if np.array_equal(expected[0][1], expected[1][1]):
+        raise RuntimeError('Both artifacts predict the same; a mix-up would go unnoticed')
+    return expected
+
+
+def stress(predictor, artifact_dirs, inputs, expected, n_threads, duration, batch_size=50):
+    """Run n_threads predicting threads and one reloading thread; return counters"""
+    stop = threading.Event()
+    counters = {'predictions': 0, 'failures': 0, 'reloads': 0}
+    lock = threading.Lock()
+    rows = list(inputs.itertuples(index=False))
+    failures = []
+
+    def predicting(seed):
+        rng = random.Random(seed)
+        done = bad = 0
+        while not stop.is_set():
+            if rng.random() < 0.8:
+                i = rng.randrange(len(rows))
+                result = predictor.predict(*rows[i])
+                if 'error' in result:
+                    ok = False
+                else:
+                    values = tuple(result[column] for column in RESULT_COLUMNS)
+                    ok = any(values == single[i] for single, _ in expected)
+                done += 1
+            else:
+                lo = rng.randrange(len(rows) - batch_size)
+                result = predictor.predict_batch(inputs.iloc[lo:lo + batch_size])
+                if isinstance(result, dict):
+                    ok = False
+                else:
+                    values = result[RESULT_COLUMNS].to_numpy()
+                    ok = any(np.array_equal(values, batch[lo:lo + batch_size]) for _, batch in expected)
+                done += batch_size
+            if not ok:
+                bad += 1
+                if len(failures) < 5:
+                    failures.append(result)
+        with lock:
+            counters['predictions'] += done
+            counters['failures'] += bad
+
+    def reloading():
+        n = 0
+        while not stop.is_set():
+            n += 1
+            load(predictor, artifact_dirs[n % 2])
+        counters['reloads'] = n
+
+    threads = [threading.Thread(target=predicting, args=(seed,)) for seed in range(n_threads)]
+    threads.append(threading.Thread(target=reloading))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    counters['seconds'] = time.perf_counter() - start
+    counters['examples'] = failures
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per thread count')
+    parser.add_argument('--rows', type=int, default=500, help='distinct inputs replayed')
+    args = parser.parse_args()
+
+    from models.predictor import CropPredictor
+
+    print("🔧 Building two artifacts from the synthetic fixture...")
+    fixture = build_fixture()
+    artifact_dirs = build_artifacts(fixture)
+    inputs = make_inputs(fixture[0], args.rows)
+    with quiet():
+        predictor = CropPredictor(micro_batch=False)
+    expected = expected_results(predictor, artifact_dirs, inputs)
+
+    total_failures = 0
+    print(f"\n{'threads':>8}{'predictions/s':>15}{'reloads':>9}{'failures':>10}")
+    for n_threads in args.threads:
+        counters = stress(predictor, artifact_dirs, inputs, expected, n_threads, args.duration)
+        total_failures += counters['failures']
+        print(f"{n_threads:>8}{counters['predictions'] / counters['seconds']:>15.0f}"
+              f"{counters['reloads']:>9}{counters['failures']:>10}")
+        for example in counters['examples']:
+            print(f"    ❌ {example}")
+
+    if total_failures:
+        print(f"\n❌ {total_failures} prediction(s) mixed models from different reloads or failed")
+        sys.exit(1)
+    print("\n✅ Every prediction came from exactly one loaded snapshot")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for ingest, training, inference, chart callbacks and cold start.
+
+    python benchmarks/run_benchmarks.py run [--quick] [--output results.json]
+    python benchmarks/run_benchmarks.py run --save-baseline
+    python benchmarks/run_benchmarks.py compare [CURRENT] [--baseline FILE] [--threshold 0.2]
+
+`run` writes a JSON file of timings (median/min/mean in ms per benchmark);
+`compare` diffs it against the stored baseline (benchmarks/baseline.json by
+default) and exits with status 1 if any benchmark's median got slower than
+the threshold allows, so regressions show up in review.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# (crops, seasons, year columns) of the synthetic wide CSVs
+QUICK_SIZES = [(10, 4, 10), (50, 4, 20)]
+FULL_SIZES = [(10, 4, 10), (50, 4, 20), (200, 6, 40), (1000, 6, 60)]
+
+
+def measure(fn, repeat=5, warmup=1):
+    """Time fn() and return summary statistics in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return {
+        'median_ms': round(statistics.median(samples), 4),
+        'min_ms': round(min(samples), 4),
+        'mean_ms': round(statistics.fmean(samples), 4),
+        'repeat': repeat
+    }
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the progress prints of the code under test"""
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        yield
+
+
+def write_synthetic_raw(raw_dir, n_crops, n_seasons, n_years, seed=42):
+    """Write Yield/Production/Area CSVs in the All-India wide format"""
+    from config import Config
+
+    rng = np.random.RandomState(seed)
+    crops = [f'Crop{i:04d}' for i in range(n_crops)]
+    seasons = ['Kharif', 'Rabi', 'Summer', 'Total', 'Autumn', 'Winter'][:n_seasons]
+    index = pd.MultiIndex.from_product([crops, seasons], names=['Crop', 'Season']).to_frame(index=False)
+    years = list(range(2015 - n_years + 10, 2015 + 10))[-n_years:]
+
+    area = rng.uniform(1, 500, size=(len(index), 1)) * rng.uniform(0.9, 1.1, size=(len(index), n_years))
+    yield_ = rng.uniform(500, 4000, size=(len(index), 1)) * (1 + 0.01 * np.arange(n_years))
+    production = area * yield_ / 1000.0
+
+    for prefix, values, file_name in (('Yield', yield_, Config.YIELD_FILE),
+                                      ('Production', production, Config.PRODUCTION_FILE),
+                                      ('Area', area, Config.AREA_FILE)):
+        wide = index.copy()
+        for j, year in enumerate(years):
+            wide[f'{prefix}-{year}-{str(year + 1)[-2:]}'] = np.round(values[:, j], 2)
+        wide.to_csv(os.path.join(raw_dir, file_name), index=False)
+
+
+def make_processor(raw_dir, processed_dir):
+    from models.data_processor import DataProcessor
+
+    processor = DataProcessor()
+    processor.config.RAW_DATA_DIR = raw_dir
+    processor.config.PROCESSED_DATA_DIR = processed_dir
+    processor.config.PROCESSED_STORE_DIR = os.path.join(processed_dir, 'merged_store')
+    return processor
+
+
+def bench_ingest(sizes, repeat):
+    """melt_dataframe, load_and_process_data and streaming ingest on growing synthetic inputs"""
+    from config import Config
+
+    results = {}
+    for n_crops, n_seasons, n_years in sizes:
+        label = f'{n_crops}x{n_seasons}x{n_years}'
+        with tempfile.TemporaryDirectory() as raw_dir, tempfile.TemporaryDirectory() as processed_dir:
+            write_synthetic_raw(raw_dir, n_crops, n_seasons, n_years)
+            processor = make_processor(raw_dir, processed_dir)
+            wide = pd.read_csv(os.path.join(raw_dir, Config.YIELD_FILE))
+
+            with quiet():
+                results[f'ingest.melt_dataframe[{label}]'] = measure(
+                    lambda: processor.melt_dataframe(wide, 'Yield'), repeat)
+                results[f'ingest.load_and_process_data.full[{label}]'] = measure(
+                    lambda: processor.load_and_process_data(force=True), repeat)
+                results[f'ingest.load_and_process_data.unchanged[{label}]'] = measure(
+                    lambda: processor.load_and_process_data(), repeat)
+                results[f'ingest.stream_process_data[{label}]'] = measure(
+                    lambda: processor.stream_process_data(chunksize=1000), repeat)
+    return results
+
+
+def build_fixture(n_crops=50, n_seasons=4, n_years=20):
+    """Process a synthetic dataset and train models on it (shared by later benchmarks)"""
+    from models.model_trainer import ModelTrainer
+
+    raw_dir = tempfile.mkdtemp()
+    processed_dir = tempfile.mkdtemp()
+    write_synthetic_raw(raw_dir, n_crops, n_seasons, n_years)
+    processor = make_processor(raw_dir, processed_dir)
+    with quiet():
+        merged_df = processor.load_and_process_data(force=True)
+        features = processor.prepare_features(merged_df)
+        trainer = ModelTrainer(processor)
+        trainer.train_models(*features)
+    return processor, merged_df, features, trainer
+
+
+def bench_training(fixture, repeat):
+    from models.model_trainer import ModelTrainer
+
+    processor, _, features, _ = fixture
+    results = {}
+    for n_jobs in (1, -1):
+        def train():
+            with quiet():
+                ModelTrainer(processor).train_models(*features, n_jobs=n_jobs)
+        results[f'training.train_models[jobs={n_jobs}]'] = measure(train, repeat, warmup=0)
+
+    def train_separate():
+        with quiet():
+            ModelTrainer(processor).train_models(*features, multi_output=False)
+    # Previous layout: one scaler, split and model per target
+    results['training.train_models[jobs=1,separate]'] = measure(train_separate, repeat, warmup=0)
+
+    trainer = ModelTrainer(processor)
+    with quiet():
+        results['training.fit_trend_models'] = measure(lambda: trainer.fit_trend_models(*features), repeat)
+    return results
+
+
+def bench_inference(fixture, repeat, batch_size=1000):
+    from models.artifact import save_artifact, load_artifact
+    from models.model_trainer import ModelTrainer
+    from models.predictor import CropPredictor
+
+    processor, merged_df, features, trainer = fixture
+    models = trainer.models_to_save()
+    artifact_dir = tempfile.mkdtemp()
+    save_artifact(models, artifact_dir)
+
+    # Previous two-model layout, for comparison with the multi-output pipeline
+    separate = ModelTrainer(processor)
+    with quiet():
+        separate.train_models(*features, multi_output=False)
+    separate_dir = tempfile.mkdtemp()
+    save_artifact(separate.models_to_save(), separate_dir)
+
+    rng = np.random.RandomState(0)
+    crops = rng.choice(processor.le_crop.classes_, batch_size)
+    seasons = rng.choice(processor.le_season.classes_, batch_size)
+    areas = rng.uniform(1, 1000, batch_size).round(1)
+    years = rng.randint(2000, 2031, batch_size)
+
+    results = {}
+    variants = (('sklearn', models), ('artifact', load_artifact(artifact_dir)),
+                ('artifact,separate', load_artifact(separate_dir)))
+    for variant, variant_models in variants:
+        with quiet():
+            predictor = CropPredictor(cache_size=0, micro_batch=False)
+        predictor.models = variant_models
+        # The saved surface belongs to the saved models, not the fixture
+        predictor.surface = None
+
+        def single_rows():
+            for i in range(100):
+                predictor.predict(crops[i], seasons[i], areas[i], years[i])
+
+        def batch():
+            predictor.predict_batch(crop=crops, season=seasons, area=areas, year=years)
+
+        with quiet():
+            single = measure(single_rows, repeat)
+            single.update({k: round(v / 100, 4) for k, v in single.items() if k.endswith('_ms')})
+            results[f'inference.predict.single_row[{variant}]'] = single
+            results[f'inference.predict_batch[{variant},n={batch_size}]'] = measure(batch, repeat)
+    return results
+
+
+def bench_callbacks(fixture, repeat):
+    """Chart callbacks with a cold and a warm figure cache"""
+    from models.data_store import write_store
+    import dashboard.app as dashboard_app
+
+    processor, merged_df, _, _ = fixture
+    config = dashboard_app.config
+    if config.CLIENTSIDE_CHARTS:
+        return {}
+    # get_data reloads whatever PROCESSED_STORE_DIR holds, so point it at the fixture
+    saved_paths = config.PROCESSED_DATA_DIR, config.PROCESSED_STORE_DIR
+    config.PROCESSED_DATA_DIR = tempfile.mkdtemp()
+    config.PROCESSED_STORE_DIR = os.path.join(config.PROCESSED_DATA_DIR, 'merged_store')
+    try:
+        write_store(merged_df, config.PROCESSED_STORE_DIR)
+        store, _ = dashboard_app.get_data()
+        crop = store.crops[0]
+        season = store.seasons[0]
+
+        results = {}
+        for name, callback, arg in (('update_trend_chart', dashboard_app.update_trend_chart, crop),
+                                    ('update_comparison_chart', dashboard_app.update_comparison_chart, season)):
+            figure = callback(arg)
+            assert figure.get('data'), f'{name}({arg!r}) returned an empty figure'
+
+            def cold():
+                dashboard_app.figure_cache.clear()
+                callback(arg)
+            results[f'callbacks.{name}[cold]'] = measure(cold, repeat)
+            results[f'callbacks.{name}[cached]'] = measure(lambda: callback(arg), repeat)
+        return results
+    finally:
+        config.PROCESSED_DATA_DIR, config.PROCESSED_STORE_DIR = saved_paths
+
+
+def bench_cold_import(repeat):
+    from import_time import import_report
+
+    results = {}
+    for name, statement in (('import_run_dashboard', 'import run_dashboard'),
+                            ('create_server', 'import run_dashboard; run_dashboard.create_server()')):
+        walls = [import_report(statement=statement)['wall_seconds'] * 1000.0 for _ in range(repeat)]
+        results[f'cold_start.{name}'] = {
+            'median_ms': round(statistics.median(walls), 4),
+            'min_ms': round(min(walls), 4),
+            'mean_ms': round(statistics.fmean(walls), 4),
+            'repeat': repeat
+        }
+    return results
+
+
+def environment():
+    import sklearn
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+
+def run(args):
+    sizes = QUICK_SIZES if args.quick else FULL_SIZES
+    repeat = 3 if args.quick else args.repeat
+    groups = args.only or ['ingest', 'training', 'inference', 'callbacks', 'cold_start']
+
+    results = {}
+    fixture = None
+    for group in groups:
+        print(f"⏱️  Running {group} benchmarks...")
+        if group == 'ingest':
+            results.update(bench_ingest(sizes, repeat))
+            continue
+        if group == 'cold_start':
+            results.update(bench_cold_import(repeat))
+            continue
+        if fixture is None:
+            fixture = build_fixture()
+        if group == 'training':
+            results.update(bench_training(fixture, max(1, repeat // 2)))
+        elif group == 'inference':
+            results.update(bench_inference(fixture, repeat))
+        elif group == 'callbacks':
+            results.update(bench_callbacks(fixture, repeat))
+
+    report = {'environment': environment(), 'results': results}
+    output = DEFAULT_BASELINE if args.save_baseline else args.output
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    print(f"\n{'benchmark':<62}{'median ms':>12}{'min ms':>12}")
+    for name, stats in results.items():
+        print(f"{name:<62}{stats['median_ms']:>12.3f}{stats['min_ms']:>12.3f}")
+    print(f"\n💾 Results saved to: {output}")
+
+
+def compare(args):
+    if not os.path.exists(args.baseline):
+        print(f"❌ No baseline at {args.baseline}: run `run_benchmarks.py run --save-baseline` first")
+        sys.exit(1)
+    if not os.path.exists(args.current):
+        print(f"❌ No results at {args.current}: run `run_benchmarks.py run` first")
+        sys.exit(1)
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    with open(args.current) as f:
+        current = json.load(f)['results']
+
+    regressions = 0
+    print(f"{'benchmark':<62}{'baseline':>11}{'current':>11}{'change':>9}")
+    for name in sorted(set(baseline) | set(current)):
+        if name not in baseline or name not in current:
+            status = 'new' if name not in baseline else 'missing'
+            print(f"{name:<62}{'':>11}{'':>11}{status:>9}")
+            continue
+        old, new = baseline[name]['median_ms'], current[name]['median_ms']
+        change = (new - old) / old if old else 0.0
+        flag = ''
+        if change > args.threshold:
+            flag = '  ❌ slower'
+            regressions += 1
+        elif change < -args.threshold:
+            flag = '  ✅ faster'
+        print(f"{name:<62}{old:>11.3f}{new:>11.3f}{change:>+9.1%}{flag}")
+
+    if regressions:
+        print(f"\n❌ {regressions} benchmark(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+    print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='run the benchmarks and save results as JSON')
+    run_parser.add_argument('--quick', action='store_true', help='smaller inputs and fewer repeats')
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--only', nargs='+',
+                            choices=['ingest', 'training', 'inference', 'callbacks', 'cold_start'])
+    run_parser.add_argument('--output', default='bench_results.json')
+    run_parser.add_argument('--save-baseline', action='store_true',
+                            help=f'write the results to {os.path.relpath(DEFAULT_BASELINE, PROJECT_ROOT)}')
+
+    compare_parser = subparsers.add_parser('compare', help='compare results against the baseline')
+    compare_parser.add_argument('current', nargs='?', default='bench_results.json')
+    compare_parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    compare_parser.add_argument('--threshold', type=float, default=0.2,
+                                help='allowed relative slowdown of the median (default 0.2 = 20%%)')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Report per-worker unique memory of the Gunicorn deployment.
+
+Starts `gunicorn -c gunicorn.conf.py` with 1 and with 8 workers (with and
+without preload_app), warms every worker with a few requests and reads
+/proc/<pid>/smaps_rollup for each worker. USS (private clean + dirty) is the
+memory a worker does not share with anyone else; with preload + gc.freeze
+it should stay small and flat as the worker count grows. Linux only.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PREDICT_BODY = json.dumps([{'crop': 'Rice', 'season': 'Kharif', 'area': 100, 'year': 2025}]).encode()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=2).read()
+            return True
+        except OSError:
+            time.sleep(0.25)
+    return False
+
+
+def child_pids(pid):
+    """PIDs whose parent is pid"""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def memory_kb(pid):
+    """Rss, Pss and USS (private clean + dirty) of a process in kB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1])
+    return {
+        'rss': values.get('Rss', 0),
+        'pss': values.get('Pss', 0),
+        'uss': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    }
+
+
+def measure(workers, preload, requests_per_worker=20):
+    """Start Gunicorn, warm the workers and return their memory usage"""
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, GUNICORN_PRELOAD='1' if preload else '0')
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         '--workers', str(workers), '--bind', f'127.0.0.1:{port}'],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not wait_until_up(base + '/_dash-layout'):
+            raise RuntimeError('Gunicorn did not start')
+        # Wait until every worker has booted, then spread requests across them
+        deadline = time.time() + 120
+        while len(child_pids(proc.pid)) < workers and time.time() < deadline:
+            time.sleep(0.25)
+        for _ in range(requests_per_worker * workers):
+            urllib.request.urlopen(base + '/_dash-layout').read()
+            request = urllib.request.Request(base + '/api/v1/predict', data=PREDICT_BODY,
+                                             headers={'Content-Type': 'application/json'})
+            urllib.request.urlopen(request).read()
+
+        usage = [memory_kb(pid) for pid in child_pids(proc.pid)]
+        return {
+            'workers': workers,
+            'preload': preload,
+            'master': memory_kb(proc.pid),
+            'mean_worker_uss_kb': sum(u['uss'] for u in usage) // len(usage),
+            'mean_worker_pss_kb': sum(u['pss'] for u in usage) // len(usage),
+            'mean_worker_rss_kb': sum(u['rss'] for u in usage) // len(usage),
+            'total_pss_kb': sum(u['pss'] for u in usage) + memory_kb(proc.pid)['pss']
+        }
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--json', action='store_true', help='print raw results as JSON')
+    args = parser.parse_args()
+
+    results = [measure(workers, preload) for preload in (True, False) for workers in args.workers]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'preload':<9}{'workers':>8}{'USS/worker':>12}{'PSS/worker':>12}{'RSS/worker':>12}{'total PSS':>11}  (kB)")
+    for r in results:
+        print(f"{str(r['preload']):<9}{r['workers']:>8}{r['mean_worker_uss_kb']:>12}"
+              f"{r['mean_worker_pss_kb']:>12}{r['mean_worker_rss_kb']:>12}{r['total_pss_kb']:>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,18 +5,77 @@ class Config:
     DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
     RAW_DATA_DIR = os.path.join(DATA_DIR, 'raw')
     PROCESSED_DATA_DIR = os.path.join(DATA_DIR, 'processed')
+    # Columnar copy of the processed data indexed by Crop/Season (used by the dashboard)
+    PROCESSED_STORE_DIR = os.path.join(PROCESSED_DATA_DIR, 'merged_store')
     
     # Model paths
     MODEL_DIR = os.path.join(os.path.dirname(__file__), 'saved_models')
     MODEL_FILE = os.path.join(MODEL_DIR, 'crop_prediction_models.pkl')
+    # Memory-mappable artifact (manifest + .npy tree arrays), preferred when present;
+    # a symlink (or .current pointer file) to the current versioned directory (models.publish)
+    MODEL_ARTIFACT_DIR = os.path.join(MODEL_DIR, 'crop_prediction_models')
+    # Central coverage of the prediction intervals (tree quantiles for
+    # forests, held-out residual quantiles otherwise)
+    PREDICTION_INTERVAL = 0.9
+    # Prediction engine: 'model' (global models) or 'trend' (per crop x season
+    # trend coefficients from models.trend, looked up by crop/season)
+    PREDICTION_ENGINE = os.environ.get('PREDICTION_ENGINE', 'model')
+    # Shorter crop x season series use the crop's pooled (or the global) trend
+    TREND_MIN_ROWS = 5
+    # Precomputed prediction surface (python -m models.surface): grid bounds
+    # match the dashboard inputs in create_filters; areas every SURFACE_AREA_STEP.
+    # Only inputs on a grid point are served from it, and a surface whose
+    # recorded relative error exceeds SURFACE_MAX_RELATIVE_ERROR is not used
+    PREDICTION_SURFACE_ENABLED = os.environ.get('PREDICTION_SURFACE_ENABLED', '1') == '1'
+    SURFACE_YEAR_RANGE = (2000, 2030)
+    SURFACE_AREA_RANGE = (1, 1000)
+    SURFACE_AREA_STEP = 1.0
+    SURFACE_MAX_RELATIVE_ERROR = float(os.environ.get('SURFACE_MAX_RELATIVE_ERROR', '0.001'))
+    # Largest grid (crops x seasons x years x areas) worth building; each point
+    # costs up to 24 bytes on disk and a model evaluation at build time
+    SURFACE_MAX_POINTS = int(os.environ.get('SURFACE_MAX_POINTS', '2000000'))
+    # Evaluate pickled forest/boosting models with the flat-array engine
+    # (models.artifact.MappedTreeEnsemble) instead of sklearn
+    COMPILE_TREE_MODELS = os.environ.get('COMPILE_TREE_MODELS', '1') == '1'
+    # Hyperparameter search (train_models.py --tune): memoized fold scores,
+    # rolling-origin folds and successive-halving reduction factor
+    TUNING_CACHE_DIR = os.path.join(MODEL_DIR, 'tuning_cache')
+    TUNING_FOLDS = 4
+    TUNING_HALVING_FACTOR = 3
     
     # Dashboard settings
     DEBUG = True
     HOST = '127.0.0.1'
     PORT = 8050
     
+    # Prediction cache (number of distinct inputs kept, 0 disables caching)
+    PREDICTION_CACHE_SIZE = 1024
+    # Serialized chart figures kept by the dashboard (0 disables caching)
+    FIGURE_CACHE_SIZE = 256
+    
+    # Micro-batching of concurrent single-row predictions
+    MICRO_BATCH_ENABLED = os.environ.get('MICRO_BATCH_ENABLED', '0') == '1'
+    MICRO_BATCH_MAX_SIZE = int(os.environ.get('MICRO_BATCH_MAX_SIZE', 64))
+    MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get('MICRO_BATCH_MAX_WAIT_MS', 2))
+    # Ship chart aggregates to the browser once and draw charts with clientside callbacks
+    CLIENTSIDE_CHARTS = os.environ.get('CLIENTSIDE_CHARTS', '0') == '1'
+    
+    # Latency histograms exported on /metrics (cheap enough to leave on)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    
+    # REST API: rows scored per vectorized batch (and per streamed chunk)
+    API_BATCH_CHUNK_SIZE = 5000
+    
     # Data file names
     YIELD_FILE = 'All-India-Yield.csv'
     PRODUCTION_FILE = 'All-India-Production.csv'
     AREA_FILE = 'All-India-Area.csv'
-    MERGED_FILE = 'merged_data.csv'
\ No newline at end of file
+    MERGED_FILE = 'merged_data.csv'
+    # Fingerprints and cached long tables for incremental processing
+    PROCESSING_STATE_FILE = 'processing_state.pkl'
+    
+    # Streaming ingest (DataProcessor.stream_process_data): wide rows per chunk.
+    # The number of on-disk hash partitions is sized so a bucket holds about
+    # one chunk of each file, capped to keep the spill file count bounded
+    STREAM_CHUNK_SIZE = 5000
+    STREAM_MAX_PARTITIONS = 1024
\ No newline at end of file
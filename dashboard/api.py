@@ -0,0 +1,101 @@
+import json
+import pandas as pd
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from config import Config
+
+NDJSON = 'application/x-ndjson'
+
+def _records(result):
+    """Convert a predict_batch DataFrame into JSON-safe dicts"""
+    result = result.astype(object).where(result.notna(), None)
+    return result.to_dict('records')
+
+def _read_ndjson_chunks(stream, chunk_size):
+    """Yield lists of parsed records from an NDJSON request body"""
+    chunk = []
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            chunk.append(json.loads(line))
+        except ValueError:
+            raise ValueError(f"Invalid JSON on line {line_number}")
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _predict_chunk(predictor, records):
+    """Run one vectorized batch over a list of input records"""
+    if not all(isinstance(record, dict) for record in records):
+        raise ValueError("Each input must be an object with crop, season, area and year")
+    result = predictor.predict_batch(pd.DataFrame.from_records(records))
+    if isinstance(result, dict):
+        raise ValueError(result['error'])
+    return _records(result)
+
+def create_api(get_predictor):
+    """Create the REST API blueprint; get_predictor returns the CropPredictor to use"""
+    config = Config()
+    api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+    @api.route('/predict', methods=['POST'])
+    def predict():
+        """Bulk predictions from a JSON array or NDJSON body
+
+        Responds with NDJSON (one prediction per line, streamed chunk by chunk)
+        when the client sends or accepts application/x-ndjson or passes
+        ?stream=1, otherwise with a single JSON document.
+        """
+        predictor = get_predictor()
+        if not predictor.models:
+            return jsonify({'error': 'Models not loaded. Please train models first.'}), 503
+
+        chunk_size = config.API_BATCH_CHUNK_SIZE
+        ndjson_in = request.mimetype == NDJSON
+        stream_out = (request.args.get('stream') == '1' or ndjson_in
+                      or request.accept_mimetypes.best == NDJSON)
+
+        if ndjson_in:
+            lines = (line.decode('utf-8') for line in request.stream)
+            chunks = _read_ndjson_chunks(lines, chunk_size)
+        else:
+            try:
+                payload = json.loads(request.get_data(as_text=True) or 'null')
+            except ValueError:
+                return jsonify({'error': 'Request body is not valid JSON'}), 400
+            if isinstance(payload, dict):
+                payload = payload.get('inputs', [payload])
+            if not isinstance(payload, list):
+                return jsonify({'error': 'Expected a JSON array of inputs'}), 400
+            chunks = (payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size))
+
+        if not stream_out:
+            try:
+                predictions = [row for chunk in chunks for row in _predict_chunk(predictor, chunk)]
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            return jsonify({
+                'count': len(predictions),
+                'errors': sum(1 for row in predictions if row['error']),
+                'predictions': predictions
+            })
+
+        def generate():
+            try:
+                for chunk in chunks:
+                    for row in _predict_chunk(predictor, chunk):
+                        yield json.dumps(row) + '\n'
+            except ValueError as e:
+                # Headers are already sent; report the failure as the last line
+                yield json.dumps({'error': str(e)}) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype=NDJSON)
+
+    return api
+
+def register_api(server, get_predictor):
+    """Attach the REST API to the Dash app's Flask server"""
+    server.register_blueprint(create_api(get_predictor))
@@ -1,17 +1,25 @@
 import dash
-from dash import dcc, html, Input, Output, State
+from dash import dcc, html, Input, Output, State, ClientsideFunction
+from flask import Response
 import dash_bootstrap_components as dbc
 import pandas as pd
+import json
 import os
 import sys
+import threading
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models.predictor import CropPredictor
+from models.data_store import ProcessedDataStore, store_exists
+from models.publish import resolve
+from models.cache import LRUCache
+from models.metrics import CALLBACK_SECONDS, timed_function, register_collector, render_prometheus
 from dashboard.components.filters import create_filters
-from dashboard.components.predictions import create_prediction_cards
-from dashboard.components.charts import create_trend_chart, create_comparison_chart
+from dashboard.components.predictions import create_prediction_cards, format_interval
+from dashboard.components.charts import create_trend_chart, create_comparison_chart, build_chart_payload
+from dashboard.api import register_api
 from config import Config
 
 # Initialize the Dash app
@@ -19,80 +27,204 @@ app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 server = app.server
 app.title = "Crop Prediction Dashboard"
 
-# Initialize predictor and load data
 config = Config()
-predictor = CropPredictor()
-
-# Load processed data for visualizations
-try:
-    df = pd.read_csv(os.path.join(config.PROCESSED_DATA_DIR, config.MERGED_FILE))
-except:
-    df = pd.DataFrame()
-    print("Warning: Could not load processed data for visualizations")
-
-# Get available options
-options = predictor.get_available_options()
-
-# Define the layout
-app.layout = dbc.Container([
-    dbc.Row([
-        dbc.Col([
-            html.H1("🌾 Crop Prediction Dashboard", className="text-center mb-4 text-primary"),
-            html.P("Predict crop yield and production using machine learning", 
-                   className="text-center text-muted mb-5")
-        ])
-    ]),
-    
-    # Filters
-    dbc.Card([
-        dbc.CardHeader(html.H4("Input Parameters", className="mb-0")),
-        dbc.CardBody([
-            create_filters(options['crops'], options['seasons'])
-        ])
-    ], className="mb-4"),
-    
-    # Prediction Button
-    dbc.Row([
-        dbc.Col([
-            dbc.Button("Predict", id="predict-button", color="primary", size="lg", 
-                      className="w-100 mb-4")
-        ], md={'size': 6, 'offset': 3})
-    ]),
-    
-    # Results
-    create_prediction_cards(),
-    
-    # Charts (only show if data is available)
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader(html.H4("Trend Analysis", className="mb-0")),
-                dbc.CardBody([
-                    dcc.Graph(id="trend-chart") if not df.empty else html.P("Data loading...", className="text-center")
-                ])
+
+# Predictor and processed data are created on first use (get_predictor /
+# get_data) so importing this module stays cheap; Gunicorn's preload loads
+# them in the master through warm_up()
+_state_lock = threading.Lock()
+_predictor = None
+_data = None
+_data_stamp = None
+
+def get_predictor():
+    """Return the shared CropPredictor, loading models on first use"""
+    global _predictor
+    if _predictor is None:
+        with _state_lock:
+            if _predictor is None:
+                _predictor = CropPredictor()
+    return _predictor
+
+# REST API on the same Flask server (POST /api/v1/predict)
+register_api(server, get_predictor)
+
+def collect_serving_metrics():
+    """Cache, batching and model load gauges for /metrics (only once things are loaded)"""
+    samples = []
+    caches = [('figure', figure_cache.stats())]
+    if _predictor is not None:
+        caches.append(('prediction', _predictor.cache_stats()))
+        if _predictor.load_seconds is not None:
+            samples.append(('crop_model_load_seconds', 'Time taken by the last model load', 'gauge',
+                            {}, _predictor.load_seconds))
+        batch_stats = _predictor.batch_stats()
+        if batch_stats:
+            for name in ('batches', 'rows'):
+                samples.append((f'crop_microbatch_{name}_total', f'Micro-batcher {name} processed',
+                                'counter', {}, batch_stats[name]))
+            samples.append(('crop_microbatch_mean_batch_size', 'Mean rows per micro-batch', 'gauge',
+                            {}, batch_stats['mean_batch_size']))
+            samples.append(('crop_microbatch_queue_depth', 'Requests waiting for a micro-batch', 'gauge',
+                            {}, batch_stats['queue_depth']))
+    for cache_name, stats in caches:
+        for key in ('hits', 'misses', 'evictions'):
+            samples.append((f'crop_cache_{key}_total', f'Cache {key}', 'counter',
+                            {'cache': cache_name}, stats[key]))
+        samples.append(('crop_cache_size', 'Entries currently cached', 'gauge',
+                        {'cache': cache_name}, stats['size']))
+    return samples
+
+register_collector(collect_serving_metrics)
+
+@server.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+def load_visualization_data():
+    """Load processed data (columnar store if available, else CSV) and its version"""
+    try:
+        if store_exists(config.PROCESSED_STORE_DIR):
+            data = ProcessedDataStore(config.PROCESSED_STORE_DIR)
+            return data, data.data_version
+        data = pd.read_csv(os.path.join(config.PROCESSED_DATA_DIR, config.MERGED_FILE))
+        return data, str(pd.util.hash_pandas_object(data, index=False).sum())
+    except:
+        print("Warning: Could not load processed data for visualizations")
+        return pd.DataFrame(), None
+
+def data_source_stamp():
+    """Cheap fingerprint of the processed data on disk (published store version, else CSV mtime)"""
+    try:
+        if store_exists(config.PROCESSED_STORE_DIR):
+            store_dir = resolve(config.PROCESSED_STORE_DIR)
+            return store_dir, os.path.getmtime(store_dir)
+        return os.path.getmtime(os.path.join(config.PROCESSED_DATA_DIR, config.MERGED_FILE))
+    except OSError:
+        return None
+
+def get_data():
+    """Return (processed data, data version), reloading whenever the data on disk changes"""
+    stamp = data_source_stamp()
+    if _data is None or stamp != _data_stamp:
+        with _state_lock:
+            if _data is None or stamp != _data_stamp:
+                reload_data(stamp)
+    return _data
+
+# Serialized chart figures keyed by (chart type, selection, data version)
+figure_cache = LRUCache(config.FIGURE_CACHE_SIZE)
+
+def reload_data(stamp=None):
+    """Reload processed data and drop figures built from the previous version"""
+    global _data, _data_stamp
+    _data = load_visualization_data()
+    _data_stamp = data_source_stamp() if stamp is None else stamp
+    figure_cache.clear()
+    return _data[1]
+
+def cached_figure(chart_type, selection, build):
+    """Return a figure dict, building and serializing it only on a cache miss"""
+    df, data_version = get_data()
+    key = (chart_type, selection, data_version)
+    figure_json = figure_cache.get(key)
+    if figure_json is None:
+        figure_json = build(df).to_json()
+        figure_cache.put(key, figure_json)
+    return json.loads(figure_json)
+
+_chart_payload = (None, None)
+
+def get_chart_payload():
+    """Chart aggregates for clientside mode, rebuilt only when the data version changes"""
+    global _chart_payload
+    df, data_version = get_data()
+    if df.empty:
+        return None
+    if _chart_payload[0] != data_version:
+        _chart_payload = (data_version, build_chart_payload(df))
+    return _chart_payload[1]
+
+def build_layout(options, has_data=True, chart_payload=None):
+    """Build the page layout for the given crop/season options"""
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col([
+                html.H1("🌾 Crop Prediction Dashboard", className="text-center mb-4 text-primary"),
+                html.P("Predict crop yield and production using machine learning",
+                       className="text-center text-muted mb-5")
             ])
-        ], md=6),
-        
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader(html.H4("Crop Comparison", className="mb-0")),
-                dbc.CardBody([
-                    dcc.Graph(id="comparison-chart") if not df.empty else html.P("Data loading...", className="text-center")
-                ])
+        ]),
+
+        # Filters
+        dbc.Card([
+            dbc.CardHeader(html.H4("Input Parameters", className="mb-0")),
+            dbc.CardBody([
+                create_filters(options['crops'], options['seasons'])
             ])
-        ], md=6)
-    ], className="mt-4"),
-    
-    # Store for results
-    dcc.Store(id='prediction-store')
-    
-], fluid=True)
+        ], className="mb-4"),
+
+        # Prediction Button
+        dbc.Row([
+            dbc.Col([
+                dbc.Button("Predict", id="predict-button", color="primary", size="lg",
+                          className="w-100 mb-4")
+            ], md={'size': 6, 'offset': 3})
+        ]),
+
+        # Results
+        create_prediction_cards(),
+
+        # Charts (only show if data is available)
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader(html.H4("Trend Analysis", className="mb-0")),
+                    dbc.CardBody([
+                        dcc.Graph(id="trend-chart") if has_data else html.P("Data loading...", className="text-center")
+                    ])
+                ])
+            ], md=6),
+
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader(html.H4("Crop Comparison", className="mb-0")),
+                    dbc.CardBody([
+                        dcc.Graph(id="comparison-chart") if has_data else html.P("Data loading...", className="text-center")
+                    ])
+                ])
+            ], md=6)
+        ], className="mt-4"),
+
+        # Store for results
+        dcc.Store(id='prediction-store'),
+
+        # Chart aggregates shipped once to the browser in clientside mode
+        dcc.Store(id='chart-data', data=chart_payload)
+
+    ], fluid=True)
+
+def serve_layout():
+    """Layout served on each page load, using the (lazily loaded) models and data"""
+    df, _ = get_data()
+    return build_layout(
+        get_predictor().get_available_options(),
+        has_data=not df.empty,
+        chart_payload=get_chart_payload() if config.CLIENTSIDE_CHARTS else None
+    )
+
+# Validate callbacks against a skeleton layout so serve_layout isn't run at import
+app.validation_layout = build_layout({'crops': [], 'seasons': []})
+app.layout = serve_layout
 
 # Callbacks
 @app.callback(
     [Output('yield-result', 'children'),
      Output('production-result', 'children'),
      Output('productivity-result', 'children'),
+     Output('yield-interval', 'children'),
+     Output('production-interval', 'children'),
      Output('prediction-store', 'data')],
     [Input('predict-button', 'n_clicks')],
     [State('crop-dropdown', 'value'),
@@ -100,45 +232,80 @@ app.layout = dbc.Container([
      State('area-input', 'value'),
      State('year-input', 'value')]
 )
+@timed_function(CALLBACK_SECONDS, 'make_prediction')
 def make_prediction(n_clicks, crop, season, area, year):
     if not n_clicks or not all([crop, season, area, year]):
-        return "Click Predict", "Click Predict", "Click Predict", {}
-    
-    result = predictor.predict(crop, season, area, year)
-    
+        return "Click Predict", "Click Predict", "Click Predict", "", "", {}
+
+    result = get_predictor().predict(crop, season, area, year)
+
     if 'error' in result:
-        return f"Error: {result['error']}", "Error", "Error", {}
-    
+        return f"Error: {result['error']}", "Error", "Error", "", "", {}
+
     return (
         f"{result['predicted_yield']:,.0f}",
         f"{result['predicted_production']:,.0f}",
         f"{result['productivity']:.2f}",
+        format_interval(result, 'yield'),
+        format_interval(result, 'production'),
         result
     )
 
-# Only add chart callbacks if data is available
-if not df.empty:
+# Chart callbacks (the graphs are only in the layout when data is available)
+if config.CLIENTSIDE_CHARTS:
+    # Charts are drawn in the browser from the chart-data store (assets/charts.js)
+    app.clientside_callback(
+        ClientsideFunction(namespace='charts', function_name='trend'),
+        Output('trend-chart', 'figure'),
+        [Input('crop-dropdown', 'value'), Input('chart-data', 'data')]
+    )
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='charts', function_name='comparison'),
+        Output('comparison-chart', 'figure'),
+        [Input('season-dropdown', 'value'), Input('chart-data', 'data')]
+    )
+else:
     @app.callback(
         Output('trend-chart', 'figure'),
         [Input('crop-dropdown', 'value')]
     )
+    @timed_function(CALLBACK_SECONDS, 'update_trend_chart')
     def update_trend_chart(crop):
-        if not crop:
+        if not crop or get_data()[0].empty:
             return {}
-        return create_trend_chart(df, crop, 'Yield')
+        return cached_figure('trend', crop, lambda df: create_trend_chart(df, crop, 'Yield'))
 
     @app.callback(
         Output('comparison-chart', 'figure'),
         [Input('season-dropdown', 'value')]
     )
+    @timed_function(CALLBACK_SECONDS, 'update_comparison_chart')
     def update_comparison_chart(season):
-        if not season:
+        if not season or get_data()[0].empty:
             return {}
-        return create_comparison_chart(df, season)
+        return cached_figure('comparison', season, lambda df: create_comparison_chart(df, season))
+
+def warm_up():
+    """Load models and data and build every chart figure once
+
+    Called in the Gunicorn master before forking so workers share all of it.
+    """
+    df, _ = get_data()
+    options = get_predictor().get_available_options()
+    if df.empty:
+        return
+    if config.CLIENTSIDE_CHARTS:
+        get_chart_payload()
+        return
+    for crop in options['crops']:
+        cached_figure('trend', crop, lambda df: create_trend_chart(df, crop, 'Yield'))
+    for season in options['seasons']:
+        cached_figure('comparison', season, lambda df: create_comparison_chart(df, season))
 
 # Make sure this works for both old and new Dash versions
 if __name__ == '__main__':
     try:
         app.run(debug=config.DEBUG, host=config.HOST, port=config.PORT)
     except AttributeError:
-        app.run_server(debug=config.DEBUG, host=config.HOST, port=config.PORT)
\ No newline at end of file
+        app.run_server(debug=config.DEBUG, host=config.HOST, port=config.PORT)
@@ -0,0 +1,63 @@
+// Clientside versions of create_trend_chart / create_comparison_chart
+// (dashboard/components/charts.py), drawn from the 'chart-data' store.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    charts: {
+        trend: function (crop, data) {
+            if (!crop || !data) {
+                return {};
+            }
+            var metric = 'Yield';
+            var series = data.crop_year[crop] || {Year: [], Yield: []};
+            return {
+                data: [{
+                    type: 'scatter',
+                    mode: 'lines',
+                    x: series.Year,
+                    y: series[metric],
+                    line: {shape: 'spline'},
+                    showlegend: false,
+                    hovertemplate: 'Year=%{x}<br>' + metric + '=%{y}<extra></extra>'
+                }],
+                layout: {
+                    title: {text: metric + ' Trend for ' + crop},
+                    xaxis: {title: {text: 'Year'}},
+                    yaxis: {title: {text: metric}},
+                    hovermode: 'x unified',
+                    template: data.template
+                }
+            };
+        },
+
+        comparison: function (season, data) {
+            if (!season || !data) {
+                return {};
+            }
+            var table = data.season_crop[season] || {Crop: [], Yield: [], Production: []};
+            return {
+                data: [{
+                    type: 'bar',
+                    name: 'Yield (kg/ha)',
+                    x: table.Crop,
+                    y: table.Yield,
+                    yaxis: 'y',
+                    offsetgroup: '1'
+                }, {
+                    type: 'bar',
+                    name: 'Production (Lakh Tonnes)',
+                    x: table.Crop,
+                    y: table.Production,
+                    yaxis: 'y2',
+                    offsetgroup: '2'
+                }],
+                layout: {
+                    title: {text: 'Crop Comparison - ' + season + ' Season'},
+                    xaxis: {title: {text: 'Crops'}},
+                    yaxis: {title: {text: 'Yield (kg/ha)'}, side: 'left'},
+                    yaxis2: {title: {text: 'Production (Lakh Tonnes)'}, side: 'right', overlaying: 'y'},
+                    barmode: 'group',
+                    template: data.template
+                }
+            };
+        }
+    }
+});
@@ -2,9 +2,35 @@ import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 
+def select_rows(data, column, value):
+    """Rows where column == value; uses the store index when given a ProcessedDataStore"""
+    if hasattr(data, 'select'):
+        return data.select(column, value)
+    return data[data[column] == value]
+
+def crop_year_means(data, crop, metrics):
+    """Yearly means of metrics for one crop, from the precomputed cube when available"""
+    cube = getattr(data, 'cube', None)
+    if cube is not None:
+        table = cube['crop_year'].get(crop)
+        if table is None:
+            return pd.DataFrame(columns=['Year'] + metrics)
+        return table[['Year'] + metrics]
+    return select_rows(data, 'Crop', crop).groupby('Year')[metrics].mean().reset_index()
+
+def season_crop_means(data, season, metrics):
+    """Per-crop means of metrics for one season, from the precomputed cube when available"""
+    cube = getattr(data, 'cube', None)
+    if cube is not None:
+        table = cube['season_crop'].get(season)
+        if table is None:
+            return pd.DataFrame(columns=['Crop'] + metrics)
+        return table[['Crop'] + metrics]
+    return select_rows(data, 'Season', season).groupby('Crop', observed=True)[metrics].mean().reset_index()
+
 def create_trend_chart(df, crop, metric):
     """Create trend chart for selected crop and metric"""
-    crop_data = df[df['Crop'] == crop].groupby('Year')[metric].mean().reset_index()
+    crop_data = crop_year_means(df, crop, [metric])
     
     fig = px.line(crop_data, x='Year', y=metric, 
                   title=f'{metric} Trend for {crop}',
@@ -21,7 +47,7 @@ def create_trend_chart(df, crop, metric):
 
 def create_comparison_chart(df, season):
     """Create comparison chart across crops for selected season"""
-    season_data = df[df['Season'] == season].groupby('Crop')[['Yield', 'Production']].mean().reset_index()
+    season_data = season_crop_means(df, season, ['Yield', 'Production'])
     
     fig = go.Figure()
     
@@ -50,4 +76,23 @@ def create_comparison_chart(df, season):
         template='plotly_white'
     )
     
-    return fig
\ No newline at end of file
+    return fig
+
+def build_chart_payload(df):
+    """Aggregates and template the clientside chart callbacks need, as plain JSON data"""
+    import plotly.io as pio
+    
+    cube = getattr(df, 'cube', None)
+    if cube is None:
+        from models.data_store import build_aggregate_cube
+        cube = build_aggregate_cube(df)
+    
+    def to_columns(table):
+        # Replace NaN with None so the payload is valid JSON
+        return {col: [None if pd.isna(v) else v for v in table[col].tolist()] for col in table.columns}
+    
+    return {
+        'crop_year': {crop: to_columns(table) for crop, table in cube['crop_year'].items()},
+        'season_crop': {season: to_columns(table) for season, table in cube['season_crop'].items()},
+        'template': pio.templates['plotly_white'].to_plotly_json()
+    }
\ No newline at end of file
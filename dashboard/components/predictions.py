@@ -1,6 +1,14 @@
 import dash_bootstrap_components as dbc
 from dash import html
 
+def format_interval(result, target):
+    """Card caption for a prediction's interval, labelled with the coverage it was built for"""
+    lower, upper = result.get(f'{target}_lower'), result.get(f'{target}_upper')
+    coverage = result.get(f'{target}_coverage')
+    if lower is None or upper is None or coverage is None:
+        return ""
+    return f"{coverage:.0%} range: {lower:,.0f} – {upper:,.0f}"
+
 def create_prediction_cards():
     """Create prediction result cards"""
     return dbc.Row([
@@ -9,6 +17,7 @@ def create_prediction_cards():
                 dbc.CardBody([
                     html.H4("Predicted Yield", className="card-title text-primary"),
                     html.H2(id="yield-result", className="text-success"),
+                    html.P(id="yield-interval", className="text-muted small mb-1"),
                     html.P("kg/hectare", className="text-muted")
                 ])
             ], className="mb-3")
@@ -19,6 +28,7 @@ def create_prediction_cards():
                 dbc.CardBody([
                     html.H4("Predicted Production", className="card-title text-primary"),
                     html.H2(id="production-result", className="text-info"),
+                    html.P(id="production-interval", className="text-muted small mb-1"),
                     html.P("Lakh Tonnes", className="text-muted")
                 ])
             ], className="mb-3")
@@ -0,0 +1,32 @@
+"""
+Gunicorn configuration: load models and data once in the master, then fork.
+
+Usage:
+    gunicorn -c gunicorn.conf.py
+
+Workers/threads can be overridden with WEB_CONCURRENCY and GUNICORN_THREADS
+(or the usual command line flags).
+"""
+import gc
+import os
+
+wsgi_app = 'run_dashboard:create_server()'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+# Import the app (models, processed data, chart cache) in the master before forking
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# Keep the collector from touching (and so copying) objects while the app loads
+gc.disable()
+
+def when_ready(server):
+    # Move everything loaded so far to the permanent generation: the collector
+    # then never writes to those objects' headers, so their pages stay shared
+    gc.freeze()
+    gc.enable()
+
+def pre_fork(server, worker):
+    gc.freeze()
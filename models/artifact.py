@@ -0,0 +1,472 @@
+"""
+Memory-mappable model artifact format.
+
+The artifact is a directory holding a small ``manifest.pkl`` (encoders,
+scalers, metadata and any non-tree model) plus one ``.npy`` file per large
+numeric array of the tree ensembles. The ``.npy`` files are opened with
+``mmap_mode='r'`` so every worker process serving the same artifact shares
+the tree nodes through the OS page cache instead of holding a private copy.
+Encoders, scalers and linear models are stored as numpy-only equivalents, so
+loading an artifact does not import scikit-learn.
+
+Each save writes a new versioned directory and switches the artifact path
+(a symlink, or a pointer file where symlinks are unavailable) to it
+atomically, see models.publish; files that workers have mapped are never
+rewritten.
+"""
+import os
+import pickle
+import time
+
+import numpy as np
+
+from models.publish import new_version_dir, publish, resolve
+
+MANIFEST_FILE = 'manifest.pkl'
+ARTIFACT_VERSION = 3
+TREE_ARRAYS = ('feature', 'threshold', 'children', 'value', 'roots')
+
+
+class ArrayLabelEncoder:
+    """numpy-only stand-in for a fitted LabelEncoder (classes_ and transform)"""
+
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes)
+
+    def transform(self, values):
+        values = np.asarray(values)
+        codes = np.searchsorted(self.classes_, values)
+        codes = np.minimum(codes, len(self.classes_) - 1)
+        unknown = self.classes_[codes] != values
+        if np.any(unknown):
+            raise ValueError(f'y contains previously unseen labels: {values[unknown].tolist()}')
+        return codes
+
+    def inverse_transform(self, codes):
+        return self.classes_[np.asarray(codes)]
+
+
+class ArrayStandardScaler:
+    """numpy-only stand-in for a fitted StandardScaler"""
+
+    def __init__(self, mean, scale):
+        self.mean_ = None if mean is None else np.asarray(mean, dtype=float)
+        self.scale_ = None if scale is None else np.asarray(scale, dtype=float)
+
+    def transform(self, X):
+        X = np.array(X, dtype=float)
+        if self.mean_ is not None:
+            X -= self.mean_
+        if self.scale_ is not None:
+            X /= self.scale_
+        return X
+
+    def inverse_transform(self, X):
+        X = np.array(X, dtype=float)
+        if self.scale_ is not None:
+            X *= self.scale_
+        if self.mean_ is not None:
+            X += self.mean_
+        return X
+
+
+class ArrayLinearModel:
+    """numpy-only stand-in for a fitted linear regression model"""
+
+    def __init__(self, coef, intercept):
+        self.coef_ = np.asarray(coef, dtype=float)
+        self.intercept_ = np.asarray(intercept, dtype=float)
+
+    def predict(self, X):
+        return np.asarray(X, dtype=float) @ self.coef_.T + self.intercept_
+
+
+def lighten(obj):
+    """Replace fitted sklearn preprocessors/linear models with numpy-only equivalents
+
+    Keeps scikit-learn out of the serving process entirely; objects that have
+    no equivalent are returned unchanged.
+    """
+    name = type(obj).__name__
+    if name == 'LabelEncoder':
+        return ArrayLabelEncoder(obj.classes_)
+    if name == 'StandardScaler':
+        return ArrayStandardScaler(obj.mean_, obj.scale_)
+    if name in ('LinearRegression', 'Ridge', 'Lasso', 'ElasticNet'):
+        return ArrayLinearModel(obj.coef_, obj.intercept_)
+    return obj
+
+
+def compile_nodes(left, right, threshold):
+    """Build the traversal arrays from sklearn-style children (-1 = leaf) and thresholds
+
+    Returns (children, threshold32): children is interleaved [left, right] per
+    node with leaves pointing at themselves, so every row can take exactly
+    max_depth steps without checking for leaves. threshold32 is the largest
+    float32 <= each threshold (+inf at leaves): comparing float32 inputs to it
+    gives the same split as sklearn's float32 input vs float64 threshold.
+    """
+    left = np.asarray(left)
+    right = np.asarray(right)
+    leaf = left == -1
+    nodes = np.arange(len(left), dtype=np.int32)
+    children = np.empty(2 * len(left), dtype=np.int32)
+    children[0::2] = np.where(leaf, nodes, left)
+    children[1::2] = np.where(leaf, nodes, right)
+
+    threshold = np.where(leaf, np.inf, np.asarray(threshold, dtype=np.float64))
+    threshold32 = threshold.astype(np.float32)
+    rounded_up = threshold32.astype(np.float64) > threshold
+    threshold32[rounded_up] = np.nextafter(threshold32[rounded_up], np.float32(-np.inf))
+    return children, threshold32
+
+
+def flatten_tree_ensemble(model):
+    """Convert a fitted sklearn forest/boosting model into flat node arrays
+
+    All trees are concatenated into one set of node arrays with global child
+    indices (see compile_nodes). Returns (arrays, meta).
+    """
+    if hasattr(model, 'init_') and hasattr(model, 'learning_rate'):
+        # Gradient boosting: prediction = init + learning_rate * sum(trees)
+        if isinstance(model.init_, str) and model.init_ == 'zero':
+            init = np.zeros(model.n_trees_per_iteration_ if hasattr(model, 'n_trees_per_iteration_') else 1)
+        elif hasattr(model.init_, 'constant_'):
+            init = np.asarray(model.init_.constant_, dtype=float).ravel()
+        else:
+            raise NotImplementedError(f'Unsupported init estimator: {model.init_!r}')
+        estimators = [est for stage in model.estimators_ for est in stage]
+        meta = {'kind': 'boosting', 'init': init, 'scale': float(model.learning_rate)}
+    elif hasattr(model, 'estimators_'):
+        estimators = list(model.estimators_)
+        meta = {'kind': 'forest', 'scale': 1.0 / len(estimators)}
+    else:
+        raise NotImplementedError(f'Not a tree ensemble: {type(model).__name__}')
+
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset = 0
+    for est in estimators:
+        tree = est.tree_
+        children_left = tree.children_left.astype(np.int32)
+        children_right = tree.children_right.astype(np.int32)
+        leaf = children_left == -1
+
+        feature.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+        threshold.append(tree.threshold.astype(np.float64))
+        left.append(np.where(leaf, -1, children_left + offset).astype(np.int32))
+        right.append(np.where(leaf, -1, children_right + offset).astype(np.int32))
+        value.append(tree.value[:, :, 0].astype(np.float64))
+        roots.append(offset)
+        offset += tree.node_count
+
+    children, threshold32 = compile_nodes(np.concatenate(left), np.concatenate(right),
+                                          np.concatenate(threshold))
+    arrays = {
+        'feature': np.concatenate(feature),
+        'threshold': threshold32,
+        'children': children,
+        'value': np.concatenate(value),
+        'roots': np.asarray(roots, dtype=np.int32)
+    }
+    meta.update({
+        'model_class': type(model).__name__,
+        'n_features': int(model.n_features_in_),
+        'n_outputs': int(arrays['value'].shape[1]),
+        'max_depth': int(max(est.tree_.max_depth for est in estimators))
+    })
+    return arrays, meta
+
+
+class MappedTreeEnsemble:
+    """Tree ensemble evaluated directly from (memory-mapped) node arrays
+
+    Rows and trees are walked together: one numpy gather per array per tree
+    level, for a single row or a whole batch, with none of sklearn's
+    per-call validation and dispatch.
+    """
+
+    def __init__(self, arrays, meta):
+        for name in TREE_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.meta = meta
+        self.n_features_in_ = meta['n_features']
+        self.n_outputs_ = meta['n_outputs']
+
+    def apply(self, X):
+        """Return the leaf node reached in every tree, shape (n_rows, n_trees)"""
+        # sklearn evaluates trees on float32 inputs (thresholds are adjusted to match)
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_trees = len(X), len(self.roots)
+        # Tree-major (tree, row) pairs keep each gather within one tree's nodes
+        nodes = np.repeat(self.roots, n_rows)
+        row_offsets = np.tile(np.arange(n_rows, dtype=np.int32) * X.shape[1], n_trees)
+        values = X.ravel()
+        index = np.empty(len(nodes), dtype=np.int32)
+        go_right = np.empty(len(nodes), dtype=bool)
+        for _ in range(self.meta['max_depth']):
+            np.take(self.feature, nodes, out=index)
+            index += row_offsets
+            np.greater(values.take(index), self.threshold.take(nodes), out=go_right)
+            nodes *= 2
+            nodes += go_right
+            np.take(self.children, nodes, out=nodes)
+        return nodes.reshape(n_trees, n_rows).T
+
+    def predict_interval(self, X, quantiles=(0.05, 0.95)):
+        """Forest prediction plus quantiles of the individual trees' outputs
+
+        One traversal gives both the point estimate (identical to predict) and
+        the (low, high) band for every row and output. Only forests have
+        meaningful per-tree outputs; boosting raises NotImplementedError.
+        """
+        if self.meta['kind'] != 'forest':
+            raise NotImplementedError('Tree quantiles need a forest')
+        per_tree = self.value[self.apply(X)]
+        low, high = np.quantile(per_tree, quantiles, axis=1)
+        point = per_tree.sum(axis=1) * self.meta['scale']
+        if self.n_outputs_ == 1:
+            return point[:, 0], low[:, 0], high[:, 0]
+        return point, low, high
+
+    def predict(self, X):
+        """Predict like the original sklearn estimator"""
+        leaf_values = self.value[self.apply(X)]
+        raw = leaf_values.sum(axis=1) * self.meta['scale']
+        if self.meta['kind'] == 'boosting':
+            raw = raw + self.meta['init']
+        return raw[:, 0] if self.n_outputs_ == 1 else raw
+
+
+class StackedOutputs:
+    """One single-output model per target column (a MultiOutputRegressor), predicted together"""
+
+    def __init__(self, estimators):
+        self.estimators_ = list(estimators)
+
+    def predict(self, X):
+        return np.column_stack([est.predict(X) for est in self.estimators_])
+
+
+def compile_tree_ensemble(model):
+    """Return the array engine for a fitted sklearn forest/boosting model
+
+    A MultiOutputRegressor of tree ensembles becomes StackedOutputs of engines.
+    Raises NotImplementedError for anything that is not a supported tree ensemble.
+    """
+    if type(model).__name__ == 'MultiOutputRegressor':
+        return StackedOutputs(compile_tree_ensemble(est) for est in model.estimators_)
+    return MappedTreeEnsemble(*flatten_tree_ensemble(model))
+
+
+# (model, scaler) key pairs of the two artifact layouts: one multi-output
+# pipeline, or the older separate yield and production models
+MODEL_KEYS = (('model', 'scaler'), ('yield_model', 'yield_scaler'), ('production_model', 'production_scaler'))
+
+
+def model_keys(models):
+    """The (model, scaler) key pairs present in a models dict"""
+    return [(model_key, scaler_key) for model_key, scaler_key in MODEL_KEYS if model_key in models]
+
+
+def check_equivalence(reference, compiled, X=None, n_features=4, rtol=1e-9, atol=1e-6):
+    """Raise ValueError unless compiled predicts like reference on X (random rows by default)"""
+    if X is None:
+        rng = np.random.RandomState(42)
+        # Standardized-looking rows plus a wide spread to reach extreme splits
+        X = np.vstack([rng.normal(size=(256, n_features)), rng.normal(scale=10, size=(64, n_features))])
+    expected = np.asarray(reference.predict(X))
+    actual = np.asarray(compiled.predict(X))
+    if expected.shape != actual.shape or not np.allclose(actual, expected, rtol=rtol, atol=atol):
+        worst = np.max(np.abs(actual - expected)) if expected.shape == actual.shape else 'shape mismatch'
+        raise ValueError(f'Compiled {type(reference).__name__} differs from sklearn (max error {worst})')
+    return True
+
+
+def save_artifact(models, artifact_dir):
+    """Write a models dict (as produced by ModelTrainer) as a mappable artifact
+    
+    The files go to a fresh version directory that artifact_dir is switched
+    to at the end; processes still mapping the previous version keep it.
+    """
+    target_dir = artifact_dir
+    artifact_dir = new_version_dir(target_dir)
+    manifest = {'artifact_version': ARTIFACT_VERSION, 'mapped': {}, 'objects': {}, 'stacked': {}}
+
+    items = list(models.items())
+    for key, obj in items:
+        if type(obj).__name__ == 'MultiOutputRegressor':
+            # Store each output's model under key.<i>; load_artifact stacks them again
+            manifest['stacked'][key] = len(obj.estimators_)
+            items.extend((f'{key}.{i}', est) for i, est in enumerate(obj.estimators_))
+            continue
+        try:
+            arrays, meta = flatten_tree_ensemble(obj)
+        except (NotImplementedError, AttributeError):
+            manifest['objects'][key] = lighten(obj)
+            continue
+        for name, array in arrays.items():
+            np.save(os.path.join(artifact_dir, f'{key}.{name}.npy'), np.ascontiguousarray(array))
+        manifest['mapped'][key] = meta
+
+    manifest_path = os.path.join(artifact_dir, MANIFEST_FILE)
+    with open(manifest_path, 'wb') as f:
+        pickle.dump(manifest, f, protocol=pickle.HIGHEST_PROTOCOL)
+    # Only a complete version is ever published
+    publish(target_dir, artifact_dir)
+    return os.path.join(target_dir, MANIFEST_FILE)
+
+
+def artifact_exists(artifact_dir):
+    """Check whether a complete artifact is present"""
+    return os.path.exists(os.path.join(resolve(artifact_dir), MANIFEST_FILE))
+
+
+def load_artifact(artifact_dir, mmap=True):
+    """Load an artifact back into a models dict usable by CropPredictor"""
+    # Read every file from the version current now, even if a save switches it meanwhile
+    artifact_dir = resolve(artifact_dir)
+    with open(os.path.join(artifact_dir, MANIFEST_FILE), 'rb') as f:
+        manifest = pickle.load(f)
+
+    models = dict(manifest['objects'])
+    mmap_mode = 'r' if mmap else None
+    for key, meta in manifest['mapped'].items():
+        if manifest['artifact_version'] < 3:
+            # Version 2 stored left/right children and float64 thresholds
+            arrays = {
+                name: np.load(os.path.join(artifact_dir, f'{key}.{name}.npy'), mmap_mode=mmap_mode)
+                for name in ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+            }
+            arrays['children'], arrays['threshold'] = compile_nodes(
+                arrays.pop('left'), arrays.pop('right'), arrays['threshold'])
+        else:
+            arrays = {
+                name: np.load(os.path.join(artifact_dir, f'{key}.{name}.npy'), mmap_mode=mmap_mode)
+                for name in TREE_ARRAYS
+            }
+        models[key] = MappedTreeEnsemble(arrays, meta)
+    for key, n_outputs in manifest.get('stacked', {}).items():
+        models[key] = StackedOutputs(models.pop(f'{key}.{i}') for i in range(n_outputs))
+    return models
+
+
+def _memory_usage_kb():
+    """Return (anonymous, file-backed) resident memory in kB on Linux"""
+    usage = {}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(('RssAnon:', 'RssFile:', 'VmRSS:')):
+                    name, value = line.split(':', 1)
+                    usage[name] = int(value.split()[0])
+    except OSError:
+        import resource
+        usage['VmRSS'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage
+
+
+def measure_load(fmt, path):
+    """Load models in the given format and report load time and memory"""
+    before = _memory_usage_kb()
+    start = time.perf_counter()
+    if fmt == 'pickle':
+        with open(path, 'rb') as f:
+            models = pickle.load(f)
+    else:
+        models = load_artifact(path)
+    load_seconds = time.perf_counter() - start
+
+    # Touch every model once so mapped pages are actually faulted in
+    features = np.zeros((1, 4))
+    for key, _ in model_keys(models):
+        models[key].predict(features)
+    after = _memory_usage_kb()
+
+    return {
+        'format': fmt,
+        'load_seconds': round(load_seconds, 4),
+        'rss_delta_kb': after.get('VmRSS', 0) - before.get('VmRSS', 0),
+        'anon_delta_kb': after.get('RssAnon', 0) - before.get('RssAnon', 0),
+        'file_delta_kb': after.get('RssFile', 0) - before.get('RssFile', 0)
+    }
+
+
+def compare_formats(pickle_path, artifact_dir):
+    """Measure pickle vs artifact loading, each in a fresh interpreter"""
+    import json
+    import subprocess
+    import sys
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for fmt, path in (('pickle', pickle_path), ('artifact', artifact_dir)):
+        output = subprocess.run(
+            [sys.executable, '-W', 'ignore', '-m', 'models.artifact', '--measure', fmt, path],
+            cwd=project_root, capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    import sys
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from config import Config
+    # Use the importable module so pickled classes aren't bound to __main__
+    from models.artifact import save_artifact, artifact_exists, compare_formats, measure_load, model_keys
+
+    config = Config()
+    parser = argparse.ArgumentParser(description='Build or benchmark the mappable model artifact')
+    parser.add_argument('--build', action='store_true', help='convert the pickle into an artifact')
+    parser.add_argument('--verify', action='store_true',
+                        help='check the array engine against sklearn on the processed data and random rows')
+    parser.add_argument('--measure', nargs=2, metavar=('FORMAT', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure_load(*args.measure)))
+        sys.exit(0)
+
+    if args.build:
+        with open(config.MODEL_FILE, 'rb') as f:
+            save_artifact(pickle.load(f), config.MODEL_ARTIFACT_DIR)
+        print(f"✅ Artifact written to {config.MODEL_ARTIFACT_DIR}")
+
+    if not artifact_exists(config.MODEL_ARTIFACT_DIR):
+        print("❌ No artifact found. Run with --build first.")
+        sys.exit(1)
+
+    if args.verify:
+        import pandas as pd
+        from models.artifact import check_equivalence, compile_tree_ensemble, load_artifact
+
+        with open(config.MODEL_FILE, 'rb') as f:
+            reference = pickle.load(f)
+        mapped = load_artifact(config.MODEL_ARTIFACT_DIR)
+        features = pd.read_csv(os.path.join(config.PROCESSED_DATA_DIR, config.MERGED_FILE))
+        features = features[reference['feature_names']].dropna().to_numpy()
+        failed = False
+        for key, scaler_key in model_keys(reference):
+            rows = reference[scaler_key].transform(features)
+            engines = {'artifact': mapped[key]}
+            try:
+                engines['compiled'] = compile_tree_ensemble(reference[key])
+            except NotImplementedError:
+                pass
+            for name, engine in engines.items():
+                try:
+                    check_equivalence(reference[key], engine, rows)
+                    check_equivalence(reference[key], engine, n_features=rows.shape[1])
+                    print(f"✅ {key} ({name}): matches sklearn on {len(rows)} data rows + random rows")
+                except ValueError as e:
+                    failed = True
+                    print(f"❌ {key} ({name}): {e}")
+        sys.exit(1 if failed else 0)
+
+    print(f"{'format':<10}{'load (s)':>10}{'RSS Δ (kB)':>12}{'anon Δ (kB)':>13}{'file Δ (kB)':>13}")
+    for row in compare_formats(config.MODEL_FILE, config.MODEL_ARTIFACT_DIR):
+        print(f"{row['format']:<10}{row['load_seconds']:>10}{row['rss_delta_kb']:>12}"
+              f"{row['anon_delta_kb']:>13}{row['file_delta_kb']:>13}")
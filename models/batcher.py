@@ -0,0 +1,127 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row predictions into one vectorized batch
+
+    Callers block in submit() while a background thread collects requests for
+    up to max_wait_ms (or until max_batch_size rows are queued), scores them
+    with one predict_batch call and hands every caller its own result, built
+    from its row by make_result(crop, season, area, year, row values).
+    """
+
+    # Upper bounds of the batch size histogram buckets
+    BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+    def __init__(self, predict_batch, make_result, max_batch_size=64, max_wait_ms=2.0):
+        self.predict_batch = predict_batch
+        self.make_result = make_result
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.max_observed_batch = 0
+        self.wait_seconds_total = 0.0
+        self.batch_size_counts = [0] * (len(self.BATCH_SIZE_BUCKETS) + 1)
+
+    def _ensure_worker(self):
+        """Start the worker thread lazily, and again after a fork"""
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+                if self._worker_pid != os.getpid():
+                    # Requests queued in the parent process never reach this one
+                    self._queue = queue.Queue()
+                self._worker_pid = os.getpid()
+                self._worker = threading.Thread(target=self._run, name='prediction-batcher', daemon=True)
+                self._worker.start()
+
+    def submit(self, crop, season, area, year, timeout=None):
+        """Queue one prediction and wait for its result dict"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((time.perf_counter(), (crop, season, area, year), future))
+        return future.result(timeout=timeout)
+
+    def _collect(self):
+        """Block for the first request, then gather more until the size or time limit"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            inputs = [item[1] for item in batch]
+            futures = [item[2] for item in batch]
+            try:
+                results = self._execute(inputs)
+            except Exception as e:
+                results = [{'error': f'Prediction failed: {str(e)}'}] * len(batch)
+            for future, result in zip(futures, results):
+                future.set_result(result)
+            self._record(len(batch), sum(started - item[0] for item in batch))
+
+    def _execute(self, inputs):
+        """Score a list of (crop, season, area, year) tuples in one batch"""
+        crops, seasons, areas, years = zip(*inputs)
+        result = self.predict_batch(crop=list(crops), season=list(seasons),
+                                    area=list(areas), year=list(years))
+        if isinstance(result, dict):
+            return [result] * len(inputs)
+
+        rows = []
+        for (crop, season, area, year), row in zip(inputs, result.to_dict('records')):
+            if not pd.isna(row['error']):
+                rows.append({'error': row['error']})
+                continue
+            rows.append(self.make_result(crop, season, area, year, row))
+        return rows
+
+    def _record(self, size, wait_seconds):
+        with self._stats_lock:
+            self.batches += 1
+            self.rows += size
+            self.max_observed_batch = max(self.max_observed_batch, size)
+            self.wait_seconds_total += wait_seconds
+            bucket = int(np.searchsorted(self.BATCH_SIZE_BUCKETS, size))
+            self.batch_size_counts[bucket] += 1
+
+    def stats(self):
+        """Return batching metrics as a dict"""
+        with self._stats_lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'batches': self.batches,
+                'rows': self.rows,
+                'mean_batch_size': round(self.rows / self.batches, 3) if self.batches else 0.0,
+                'max_observed_batch': self.max_observed_batch,
+                'mean_queue_wait_ms': round(self.wait_seconds_total / self.rows * 1000.0, 3) if self.rows else 0.0,
+                'batch_size_buckets': dict(zip([str(b) for b in self.BATCH_SIZE_BUCKETS] + ['+Inf'],
+                                               self.batch_size_counts)),
+                'queue_depth': self._queue.qsize()
+            }
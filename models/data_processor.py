@@ -2,7 +2,56 @@ import pandas as pd
 import numpy as np
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 import os
+import re
+import glob
+import json
+import time
+import pickle
+import hashlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from config import Config
+from models.data_store import write_store, store_exists, remove_store
+
+# Bump when the processing logic changes so cached state is rebuilt
+PROCESSING_STATE_VERSION = 1
+
+MEASURES = ('Yield', 'Production', 'Area')
+
+
+def _parse_raw_file(entry):
+    """Read and melt one raw file, adding its tags as columns (runs in a worker process)"""
+    start = time.perf_counter()
+    df = pd.read_csv(entry['path'])
+    read_seconds = time.perf_counter() - start
+    
+    long_df = DataProcessor().melt_dataframe(df, entry['measure'])
+    for tag, value in entry['tags'].items():
+        long_df[tag] = value
+    total_seconds = time.perf_counter() - start
+    
+    return long_df, {
+        'path': entry['path'],
+        'measure': entry['measure'],
+        'tags': entry['tags'],
+        'rows': len(df),
+        'read_seconds': read_seconds,
+        'melt_seconds': total_seconds - read_seconds,
+        'total_seconds': total_seconds
+    }
+
+
+def _count_rows(path, block_size=1 << 20):
+    """Number of data rows in a CSV file, counted in fixed-size blocks"""
+    lines, last = 0, b'\n'
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1
+    return max(lines - 1, 0)
+
 
 class DataProcessor:
     def __init__(self):
@@ -29,29 +78,183 @@ class DataProcessor:
         
         return melted
     
-    def load_and_process_data(self):
-        """Load and process all datasets"""
+    def _file_fingerprint(self, path, previous=None):
+        """Return (size, mtime) and sha256 of a file, skipping the hash if the stat is unchanged"""
+        stat = os.stat(path)
+        stat_key = (stat.st_size, stat.st_mtime_ns)
+        if previous and previous.get('stat') == stat_key:
+            return stat_key, previous['sha256']
+        
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return stat_key, digest.hexdigest()
+    
+    @staticmethod
+    def _column_hashes(df):
+        """Hash every year column together with the Crop/Season keys"""
+        year_cols = [col for col in df.columns if col not in ['Crop', 'Season']]
+        hashes = {}
+        for col in year_cols:
+            values = pd.util.hash_pandas_object(df[['Crop', 'Season', col]], index=False).to_numpy()
+            hashes[col] = hashlib.sha256(values.tobytes()).hexdigest()
+        return hashes
+    
+    @staticmethod
+    def _column_year(col):
+        """Extract the start year from a wide-format column name"""
+        match = re.search(r'(\d{4})-\d{2}', col)
+        return int(match.group(1)) if match else None
+    
+    def _load_long(self, value_name, file_name, cached):
+        """Melt one raw file, re-melting only the year columns that changed since the cached run
+        
+        Returns (long_df, affected_years, changed) where affected_years is None when
+        every year has to be rebuilt.
+        """
+        path = os.path.join(self.config.RAW_DATA_DIR, file_name)
+        stat_key, sha256 = self._file_fingerprint(path, cached)
+        
+        if cached and cached['sha256'] == sha256:
+            cached['stat'] = stat_key
+            return cached, set(), False
+        
+        df = pd.read_csv(path)
+        print(f"  - {value_name} data: {df.shape}")
+        hashes = self._column_hashes(df)
+        
+        if cached:
+            old_hashes = cached['columns']
+            changed_cols = [col for col, h in hashes.items() if old_hashes.get(col) != h]
+            removed_cols = [col for col in old_hashes if col not in hashes]
+            affected_years = {self._column_year(col) for col in changed_cols + removed_cols}
+            kept = cached['long'][~cached['long']['Year'].isin(affected_years)]
+        else:
+            changed_cols = list(hashes)
+            affected_years = None
+            kept = None
+        
+        print(f"    Re-melting {len(changed_cols)} of {len(hashes)} year columns")
+        delta = self.melt_dataframe(df[['Crop', 'Season'] + changed_cols], value_name)
+        long_df = delta if kept is None else pd.concat([kept, delta], ignore_index=True)
+        
+        return {'stat': stat_key, 'sha256': sha256, 'columns': hashes, 'long': long_df}, affected_years, True
+    
+    @staticmethod
+    def _merge_long(yield_long, production_long, area_long):
+        """Outer-merge the three long tables on Crop/Season/Year"""
+        merged_df = yield_long.merge(production_long, on=['Crop', 'Season', 'Year'], how='outer')
+        return merged_df.merge(area_long, on=['Crop', 'Season', 'Year'], how='outer')
+    
+    def _add_features(self, merged_df, fit=True):
+        """Encode Crop/Season and add the derived feature columns
+        
+        With fit=False the encoders must already have been fitted (streaming mode).
+        """
+        # Feature engineering
+        if fit:
+            merged_df['Crop_encoded'] = self.le_crop.fit_transform(merged_df['Crop'])
+            merged_df['Season_encoded'] = self.le_season.fit_transform(merged_df['Season'])
+        else:
+            merged_df['Crop_encoded'] = self.le_crop.transform(merged_df['Crop'])
+            merged_df['Season_encoded'] = self.le_season.transform(merged_df['Season'])
+        
+        # Handle division by zero in productivity calculation
+        merged_df['Productivity'] = np.where(
+            merged_df['Area'] > 0, 
+            merged_df['Production'] / merged_df['Area'], 
+            0
+        )
+        
+        # Normalize years from 2015 (baseline year)
+        merged_df['Year_normalized'] = merged_df['Year'] - 2015
+        return merged_df
+    
+    def _save_store(self, merged_df):
+        """Write the columnar store; on failure readers fall back to the processed CSV"""
+        try:
+            write_store(merged_df, self.config.PROCESSED_STORE_DIR)
+            print(f"💾 Columnar store saved to: {self.config.PROCESSED_STORE_DIR}")
+        except OSError as e:
+            print(f"⚠️ Could not save the columnar store ({e}); readers will use the CSV")
+            # A store of the previous table must not outlive it
+            remove_store(self.config.PROCESSED_STORE_DIR)
+    
+    def _load_state(self):
+        """Load the incremental processing state, if any"""
+        state_path = os.path.join(self.config.PROCESSED_DATA_DIR, self.config.PROCESSING_STATE_FILE)
         try:
-            print("📊 Loading datasets...")
-            # Load datasets
-            yield_df = pd.read_csv(os.path.join(self.config.RAW_DATA_DIR, self.config.YIELD_FILE))
-            production_df = pd.read_csv(os.path.join(self.config.RAW_DATA_DIR, self.config.PRODUCTION_FILE))
-            area_df = pd.read_csv(os.path.join(self.config.RAW_DATA_DIR, self.config.AREA_FILE))
-            
-            print(f"  - Yield data: {yield_df.shape}")
-            print(f"  - Production data: {production_df.shape}")
-            print(f"  - Area data: {area_df.shape}")
-            
-            print("🔄 Transforming to long format...")
-            # Transform to long format
-            yield_long = self.melt_dataframe(yield_df, 'Yield')
-            production_long = self.melt_dataframe(production_df, 'Production')
-            area_long = self.melt_dataframe(area_df, 'Area')
+            with open(state_path, 'rb') as f:
+                state = pickle.load(f)
+            if state.get('version') == PROCESSING_STATE_VERSION:
+                return state
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+        return {}
+    
+    def _save_state(self, state):
+        """Persist the incremental processing state next to the processed data"""
+        state_path = os.path.join(self.config.PROCESSED_DATA_DIR, self.config.PROCESSING_STATE_FILE)
+        tmp_path = state_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, state_path)
+    
+    def _clear_state(self):
+        """Drop the incremental state once the processed table no longer comes from it"""
+        state_path = os.path.join(self.config.PROCESSED_DATA_DIR, self.config.PROCESSING_STATE_FILE)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+    
+    def load_and_process_data(self, force=False):
+        """Load and process all datasets
+        
+        Raw files are fingerprinted; unchanged files are not re-read and only the
+        year columns that changed are re-melted and merged into the cached table.
+        Pass force=True to rebuild everything from scratch.
+        """
+        try:
+            print("📊 Checking datasets...")
+            state = {} if force else self._load_state()
+            files = {
+                'Yield': self.config.YIELD_FILE,
+                'Production': self.config.PRODUCTION_FILE,
+                'Area': self.config.AREA_FILE
+            }
+            processed_path = os.path.join(self.config.PROCESSED_DATA_DIR, self.config.MERGED_FILE)
+            
+            longs = {}
+            affected_years = set()
+            any_changed = False
+            for value_name, file_name in files.items():
+                cached = state.get('files', {}).get(value_name)
+                longs[value_name], years, changed = self._load_long(value_name, file_name, cached)
+                any_changed = any_changed or changed
+                if years is None:
+                    affected_years = None
+                elif affected_years is not None:
+                    affected_years |= years
+            
+            if (not any_changed and 'merged' in state and os.path.exists(processed_path)
+                    and store_exists(self.config.PROCESSED_STORE_DIR)):
+                print("✅ Raw data unchanged, using cached processed data")
+                self.le_crop, self.le_season = state['encoders']
+                return state['merged'].copy()
             
             print("🔗 Merging datasets...")
-            # Merge datasets
-            merged_df = yield_long.merge(production_long, on=['Crop', 'Season', 'Year'], how='outer')
-            merged_df = merged_df.merge(area_long, on=['Crop', 'Season', 'Year'], how='outer')
+            yield_long, production_long, area_long = (longs[name]['long'] for name in files)
+            if affected_years is None or 'merged' not in state:
+                merged_df = self._merge_long(yield_long, production_long, area_long)
+            else:
+                # Only rebuild the rows for years that changed in any file
+                print(f"  - Rebuilding years: {sorted(affected_years)}")
+                delta = self._merge_long(*(df[df['Year'].isin(affected_years)]
+                                           for df in (yield_long, production_long, area_long)))
+                previous = state['merged'][['Crop', 'Season', 'Yield', 'Year', 'Production', 'Area']]
+                merged_df = pd.concat([previous[~previous['Year'].isin(affected_years)], delta],
+                                      ignore_index=True)
+                merged_df = merged_df.sort_values(['Crop', 'Season', 'Year']).reset_index(drop=True)
             
             print(f"  - Merged shape: {merged_df.shape}")
             
@@ -65,19 +268,7 @@ class DataProcessor:
             print(f"  - After removing missing Crop/Season/Year: {len(merged_df)}")
             
             print("⚙️ Feature engineering...")
-            # Feature engineering
-            merged_df['Crop_encoded'] = self.le_crop.fit_transform(merged_df['Crop'])
-            merged_df['Season_encoded'] = self.le_season.fit_transform(merged_df['Season'])
-            
-            # Handle division by zero in productivity calculation
-            merged_df['Productivity'] = np.where(
-                merged_df['Area'] > 0, 
-                merged_df['Production'] / merged_df['Area'], 
-                0
-            )
-            
-            # Normalize years from 2015 (baseline year)
-            merged_df['Year_normalized'] = merged_df['Year'] - 2015
+            merged_df = self._add_features(merged_df)
             
             print(f"✅ Processing complete! Final shape: {merged_df.shape}")
             print(f"  - Unique crops: {merged_df['Crop'].nunique()}")
@@ -85,11 +276,257 @@ class DataProcessor:
             print(f"  - Year range: {merged_df['Year'].min()}-{merged_df['Year'].max()}")
             
             # Save processed data
+            os.makedirs(self.config.PROCESSED_DATA_DIR, exist_ok=True)
+            merged_df.to_csv(processed_path, index=False)
+            print(f"💾 Processed data saved to: {processed_path}")
+            
+            self._save_store(merged_df)
+            
+            self._save_state({
+                'version': PROCESSING_STATE_VERSION,
+                'files': longs,
+                'merged': merged_df,
+                'encoders': (self.le_crop, self.le_season)
+            })
+            
+            return merged_df
+            
+        except Exception as e:
+            print(f"❌ Error in data processing: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+    
+    def stream_process_data(self, chunksize=None, n_partitions=None):
+        """Process raw files of any size with memory bounded by the chunk size
+        
+        Each raw file is read chunksize wide rows at a time and melted, and the
+        long rows are spilled to disk in n_partitions buckets by a hash of
+        (Crop, Season). All rows for a key therefore land in the same bucket
+        in every file, so Yield/Production/Area are joined one bucket at a
+        time and appended to the processed CSV as they are finished. Only one
+        chunk or one bucket is held in memory at once; by default
+        n_partitions is the largest file's row count divided by chunksize, so
+        a bucket is about as large as a chunk.
+        
+        The merged table is not returned (it may not fit in memory); the path
+        of the processed CSV is. The columnar store and the incremental state
+        need the whole table, so both are invalidated and readers fall back to
+        the CSV.
+        """
+        chunksize = chunksize or self.config.STREAM_CHUNK_SIZE
+        files = {
+            'Yield': self.config.YIELD_FILE,
+            'Production': self.config.PRODUCTION_FILE,
+            'Area': self.config.AREA_FILE
+        }
+        try:
+            if not n_partitions:
+                max_rows = max(_count_rows(os.path.join(self.config.RAW_DATA_DIR, file_name))
+                               for file_name in files.values())
+                n_partitions = min(max(-(-max_rows // chunksize), 1), self.config.STREAM_MAX_PARTITIONS)
+            os.makedirs(self.config.PROCESSED_DATA_DIR, exist_ok=True)
+            processed_path = os.path.join(self.config.PROCESSED_DATA_DIR, self.config.MERGED_FILE)
+            crops, seasons = set(), set()
+            
+            with tempfile.TemporaryDirectory(dir=self.config.PROCESSED_DATA_DIR) as spill_dir:
+                print(f"📊 Streaming datasets in chunks of {chunksize} rows ({n_partitions} partitions)...")
+                for value_name, file_name in files.items():
+                    rows = 0
+                    for chunk in pd.read_csv(os.path.join(self.config.RAW_DATA_DIR, file_name),
+                                             chunksize=chunksize):
+                        rows += len(chunk)
+                        long_chunk = self.melt_dataframe(chunk, value_name)
+                        long_chunk = long_chunk.dropna(subset=['Crop', 'Season'])
+                        crops.update(long_chunk['Crop'].unique())
+                        seasons.update(long_chunk['Season'].unique())
+                        
+                        keys = long_chunk[['Crop', 'Season']].astype(str)
+                        buckets = pd.util.hash_pandas_object(keys, index=False).to_numpy() % n_partitions
+                        for bucket, part in long_chunk.groupby(buckets):
+                            part_path = os.path.join(spill_dir, f'{value_name}.{bucket}.csv')
+                            part.to_csv(part_path, mode='a', header=not os.path.exists(part_path),
+                                        index=False)
+                    print(f"  - {value_name} data: {rows} rows")
+                
+                # Encoders need every label, which is known once all chunks were seen
+                self.le_crop.fit(sorted(crops))
+                self.le_season.fit(sorted(seasons))
+                
+                print(f"🔗 Merging {n_partitions} partitions...")
+                tmp_path = processed_path + '.tmp'
+                total_rows = 0
+                header = True
+                for bucket in range(n_partitions):
+                    longs = []
+                    for value_name in files:
+                        part_path = os.path.join(spill_dir, f'{value_name}.{bucket}.csv')
+                        if os.path.exists(part_path):
+                            longs.append(pd.read_csv(part_path))
+                        else:
+                            longs.append(pd.DataFrame({'Crop': pd.Series(dtype=object),
+                                                       'Season': pd.Series(dtype=object),
+                                                       value_name: pd.Series(dtype=float),
+                                                       'Year': pd.Series(dtype=int)}))
+                    if all(df.empty for df in longs):
+                        continue
+                    
+                    merged_df = self._merge_long(*longs)
+                    merged_df = merged_df.dropna(subset=['Yield', 'Production', 'Area'], how='all')
+                    merged_df = merged_df.dropna(subset=['Crop', 'Season', 'Year'])
+                    merged_df = merged_df.sort_values(['Crop', 'Season', 'Year'])
+                    merged_df = self._add_features(merged_df, fit=False)
+                    
+                    merged_df.to_csv(tmp_path, mode='w' if header else 'a', header=header, index=False)
+                    header = False
+                    total_rows += len(merged_df)
+                
+                if header:
+                    raise ValueError("No rows found in the raw data")
+                os.replace(tmp_path, processed_path)
+            
+            # The store and cached state describe the previous table
+            remove_store(self.config.PROCESSED_STORE_DIR)
+            self._clear_state()
+            
+            print(f"✅ Streaming complete! {total_rows} rows")
+            print(f"  - Unique crops: {len(crops)}")
+            print(f"  - Unique seasons: {len(seasons)}")
+            print(f"💾 Processed data saved to: {processed_path}")
+            return processed_path
+            
+        except Exception as e:
+            print(f"❌ Error in streaming data processing: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+    
+    def discover_raw_files(self, sources, tag_pattern=None):
+        r"""Resolve raw file sources into [{'path', 'measure', 'tags'}, ...]
+        
+        sources is a glob pattern (or a list of them), a manifest file (.csv or
+        .json) or a list of manifest entries. Manifest entries have a path and a
+        measure (Yield/Production/Area); every other field is a tag such as
+        State or Release, and relative paths are resolved against the manifest.
+        For globbed files the measure is taken from the file name, and tags come
+        from the named groups of tag_pattern matched against the path, e.g.
+        r'raw/(?P<State>[^/]+)/(?P<Release>\d{4})/' (a group named measure
+        overrides the file name).
+        """
+        if isinstance(sources, str) and os.path.splitext(sources)[1].lower() in ('.csv', '.json') \
+                and not glob.has_magic(sources):
+            base_dir = os.path.dirname(os.path.abspath(sources))
+            if sources.lower().endswith('.json'):
+                with open(sources) as f:
+                    records = json.load(f)
+            else:
+                records = pd.read_csv(sources, dtype=str).fillna('').to_dict('records')
+            for record in records:
+                if not os.path.isabs(record['path']):
+                    record['path'] = os.path.join(base_dir, record['path'])
+            sources = records
+        elif isinstance(sources, str):
+            sources = [sources]
+        
+        entries = []
+        for source in sources:
+            if isinstance(source, dict):
+                tags = {k: v for k, v in source.items() if k not in ('path', 'measure')}
+                entries.append({'path': source['path'], 'measure': source['measure'].capitalize(),
+                                'tags': tags})
+                continue
+            for path in sorted(glob.glob(source, recursive=True)):
+                tags = {}
+                if tag_pattern:
+                    match = re.search(tag_pattern, path)
+                    if match is None:
+                        raise ValueError(f"Path does not match tag_pattern: {path}")
+                    tags = match.groupdict()
+                measure = tags.pop('measure', None)
+                if measure is None:
+                    found = re.search('|'.join(MEASURES), os.path.basename(path), re.IGNORECASE)
+                    if found is None:
+                        raise ValueError(f"Cannot tell which measure {path} holds")
+                    measure = found.group(0)
+                entries.append({'path': path, 'measure': measure.capitalize(), 'tags': tags})
+        
+        for entry in entries:
+            if entry['measure'] not in MEASURES:
+                raise ValueError(f"Unknown measure {entry['measure']!r} for {entry['path']}")
+        if not entries:
+            raise ValueError(f"No raw files found for {sources!r}")
+        return entries
+    
+    def load_and_process_files(self, sources, tag_pattern=None, n_jobs=None):
+        """Load and process many raw files, tagged with extra dimensions such as State
+        
+        Files (see discover_raw_files) are read and melted in a process pool;
+        n_jobs=None or -1 uses all cores and 1 parses in this process. Rows are
+        joined on Crop/Season/Year plus the tag columns, so each state or
+        release keeps its own rows. Per-file timings are printed and kept in
+        self.file_timings.
+        """
+        try:
+            entries = self.discover_raw_files(sources, tag_pattern)
+            tag_names = sorted({tag for entry in entries for tag in entry['tags']})
+            for entry in entries:
+                entry['tags'] = {tag: entry['tags'].get(tag, '') for tag in tag_names}
+            
+            n_jobs = (os.cpu_count() or 1) if n_jobs in (None, -1) else max(1, n_jobs)
+            workers = min(n_jobs, len(entries))
+            print(f"📊 Parsing {len(entries)} raw files on {workers} process(es)...")
+            start = time.perf_counter()
+            if workers == 1:
+                parsed = [_parse_raw_file(entry) for entry in entries]
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    parsed = list(pool.map(_parse_raw_file, entries))
+            wall_seconds = time.perf_counter() - start
+            
+            self.file_timings = [timing for _, timing in parsed]
+            for timing in sorted(self.file_timings, key=lambda t: -t['total_seconds']):
+                tags = ', '.join(f"{k}={v}" for k, v in timing['tags'].items())
+                print(f"  - {os.path.basename(timing['path'])} [{timing['measure']}{'; ' + tags if tags else ''}]: "
+                      f"{timing['rows']} rows, read {timing['read_seconds']:.3f}s, "
+                      f"melt {timing['melt_seconds']:.3f}s")
+            print(f"  - Wall time {wall_seconds:.2f}s for "
+                  f"{sum(t['total_seconds'] for t in self.file_timings):.2f}s of parsing")
+            
+            print("🔗 Merging datasets...")
+            keys = ['Crop', 'Season', 'Year'] + tag_names
+            longs = {}
+            for measure in MEASURES:
+                frames = [long_df for long_df, timing in parsed if timing['measure'] == measure]
+                if not frames:
+                    raise ValueError(f"No {measure} files among the sources")
+                longs[measure] = pd.concat(frames, ignore_index=True)
+            merged_df = longs['Yield'].merge(longs['Production'], on=keys, how='outer')
+            merged_df = merged_df.merge(longs['Area'], on=keys, how='outer')
+            merged_df = merged_df.sort_values(tag_names + ['Crop', 'Season', 'Year']).reset_index(drop=True)
+            print(f"  - Merged shape: {merged_df.shape}")
+            
+            merged_df = merged_df.dropna(subset=['Yield', 'Production', 'Area'], how='all')
+            merged_df = merged_df.dropna(subset=['Crop', 'Season', 'Year'])
+            print(f"  - After removing empty rows: {merged_df.shape}")
+            
+            print("⚙️ Feature engineering...")
+            merged_df = self._add_features(merged_df)
+            
+            print(f"✅ Processing complete! Final shape: {merged_df.shape}")
+            for tag in tag_names:
+                print(f"  - Unique {tag} values: {merged_df[tag].nunique()}")
+            print(f"  - Unique crops: {merged_df['Crop'].nunique()}")
+            print(f"  - Unique seasons: {merged_df['Season'].nunique()}")
+            
             os.makedirs(self.config.PROCESSED_DATA_DIR, exist_ok=True)
             processed_path = os.path.join(self.config.PROCESSED_DATA_DIR, self.config.MERGED_FILE)
             merged_df.to_csv(processed_path, index=False)
             print(f"💾 Processed data saved to: {processed_path}")
             
+            self._save_store(merged_df)
+            
+            # The incremental state tracks the three default files only
+            self._clear_state()
             return merged_df
             
         except Exception as e:
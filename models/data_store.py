@@ -0,0 +1,192 @@
+"""
+Columnar store for the processed (long-format) data.
+
+Each column is written as its own ``.npy`` file with rows sorted by
+Crop/Season/Year; Crop and Season are stored as integer category codes. The
+manifest keeps the category labels plus a row index per crop (a contiguous
+slice) and per season (row positions), so a lookup reads only the matching
+rows instead of scanning the whole table.
+
+Alongside it, ``cube.pkl`` holds the crop x year and season x crop means the
+dashboard charts plot, rebuilt whenever the store is rewritten.
+
+Every write goes to a new versioned directory that the store path (a
+symlink, or a pointer file where symlinks are unavailable) is switched to
+atomically, see models.publish, so a dashboard mapping the previous store
+keeps reading unchanged files.
+"""
+import os
+import pickle
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from models.publish import new_version_dir, publish, resolve, unpublish
+
+MANIFEST_FILE = 'manifest.pkl'
+CUBE_FILE = 'cube.pkl'
+CATEGORICAL_COLUMNS = ('Crop', 'Season')
+CUBE_METRICS = ['Yield', 'Production', 'Area', 'Productivity']
+
+
+def build_aggregate_cube(df):
+    """Precompute the per-crop yearly and per-season crop means used by the charts"""
+    metrics = [col for col in CUBE_METRICS if col in df.columns]
+    crop_year = df.groupby(['Crop', 'Year'], observed=True)[metrics].mean().reset_index()
+    season_crop = df.groupby(['Season', 'Crop'], observed=True)[metrics].mean().reset_index()
+    return {
+        'metrics': metrics,
+        'crop_year': {
+            str(crop): group.drop(columns='Crop').reset_index(drop=True)
+            for crop, group in crop_year.groupby('Crop', observed=True)
+        },
+        'season_crop': {
+            str(season): group.drop(columns='Season').reset_index(drop=True)
+            for season, group in season_crop.groupby('Season', observed=True)
+        }
+    }
+
+
+def write_store(df, store_dir):
+    """Write a processed DataFrame as a columnar store and return its data version"""
+    target_dir = store_dir
+    store_dir = new_version_dir(target_dir)
+    df = df.sort_values(['Crop', 'Season', 'Year']).reset_index(drop=True)
+
+    categories = {}
+    for col in CATEGORICAL_COLUMNS:
+        cat = pd.Categorical(df[col])
+        categories[col] = list(cat.categories)
+        np.save(os.path.join(store_dir, f'{col}.npy'), cat.codes.astype(np.int32))
+
+    columns = list(df.columns)
+    for col in columns:
+        if col not in CATEGORICAL_COLUMNS:
+            values = df[col].to_numpy()
+            if values.dtype == object:
+                # Tag columns such as State; fixed-width strings stay memory-mappable
+                values = values.astype(str)
+            np.save(os.path.join(store_dir, f'{col}.npy'), values)
+
+    # Crops are contiguous after sorting; seasons need explicit row positions
+    crop_codes = pd.Categorical(df['Crop']).codes
+    crop_bounds = np.searchsorted(crop_codes, np.arange(len(categories['Crop']) + 1))
+    crop_index = {crop: (int(crop_bounds[i]), int(crop_bounds[i + 1]))
+                  for i, crop in enumerate(categories['Crop'])}
+    season_codes = pd.Categorical(df['Season']).codes
+    season_index = {}
+    for i, season in enumerate(categories['Season']):
+        rows = np.flatnonzero(season_codes == i).astype(np.int32)
+        np.save(os.path.join(store_dir, f'season_rows.{i}.npy'), rows)
+        season_index[season] = i
+
+    data_version = hashlib.sha256(
+        pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()
+    ).hexdigest()[:16]
+
+    manifest = {
+        'columns': columns,
+        'categories': categories,
+        'n_rows': len(df),
+        'crop_index': crop_index,
+        'season_index': season_index,
+        'data_version': data_version
+    }
+    cube = build_aggregate_cube(df)
+    cube['data_version'] = data_version
+    for file_name, payload in ((CUBE_FILE, cube), (MANIFEST_FILE, manifest)):
+        with open(os.path.join(store_dir, file_name), 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    publish(target_dir, store_dir)
+    return data_version
+
+
+def remove_store(store_dir):
+    """Unpublish a store (its version directories are pruned by the next write)"""
+    unpublish(store_dir)
+
+
+def store_exists(store_dir):
+    """Check whether a complete store is present"""
+    return os.path.exists(os.path.join(resolve(store_dir), MANIFEST_FILE))
+
+
+class ProcessedDataStore:
+    """Read-only view over a columnar store written by write_store"""
+
+    def __init__(self, store_dir):
+        # Pin the current version; later writes publish a different directory
+        store_dir = resolve(store_dir)
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, MANIFEST_FILE), 'rb') as f:
+            self.manifest = pickle.load(f)
+        self.columns = self.manifest['columns']
+        self.data_version = self.manifest['data_version']
+        self._arrays = {
+            col: np.load(os.path.join(store_dir, f'{col}.npy'), mmap_mode='r')
+            for col in self.columns
+        }
+        self._dtypes = {
+            col: pd.CategoricalDtype(self.manifest['categories'][col])
+            for col in CATEGORICAL_COLUMNS
+        }
+        with open(os.path.join(store_dir, CUBE_FILE), 'rb') as f:
+            self.cube = pickle.load(f)
+        # Mapped now so lookups never open files of a version that was pruned since
+        self._season_rows = {
+            i: np.load(os.path.join(store_dir, f'season_rows.{i}.npy'), mmap_mode='r')
+            for i in self.manifest['season_index'].values()
+        }
+
+    def __len__(self):
+        return self.manifest['n_rows']
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def crops(self):
+        return list(self.manifest['categories']['Crop'])
+
+    @property
+    def seasons(self):
+        return list(self.manifest['categories']['Season'])
+
+    def _frame(self, rows, columns=None):
+        """Build a DataFrame from the given row slice/positions"""
+        data = {}
+        for col in columns or self.columns:
+            values = np.asarray(self._arrays[col][rows])
+            if col in self._dtypes:
+                values = pd.Categorical.from_codes(values, dtype=self._dtypes[col])
+            data[col] = values
+        return pd.DataFrame(data)
+
+    def for_crop(self, crop, columns=None):
+        """Return all rows for one crop (reads a single contiguous slice)"""
+        if crop not in self.manifest['crop_index']:
+            return self._frame(slice(0, 0), columns)
+        start, stop = self.manifest['crop_index'][crop]
+        return self._frame(slice(start, stop), columns)
+
+    def for_season(self, season, columns=None):
+        """Return all rows for one season (reads only the indexed rows)"""
+        if season not in self.manifest['season_index']:
+            return self._frame(slice(0, 0), columns)
+        i = self.manifest['season_index'][season]
+        return self._frame(np.asarray(self._season_rows[i]), columns)
+
+    def select(self, column, value, columns=None):
+        """Return rows where column == value, using the index for Crop/Season"""
+        if column == 'Crop':
+            return self.for_crop(value, columns)
+        if column == 'Season':
+            return self.for_season(value, columns)
+        frame = self.to_frame()
+        return frame[frame[column] == value]
+
+    def to_frame(self):
+        """Materialize the whole table"""
+        return self._frame(slice(None))
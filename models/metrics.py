@@ -0,0 +1,144 @@
+"""
+Lightweight latency histograms with Prometheus text exposition.
+
+Observations cost one perf_counter() pair, a bisect and a short lock, so the
+timers can stay on in the serving hot paths. render_prometheus() formats all
+histograms plus any registered collector gauges for the /metrics route.
+"""
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from config import Config
+
+# Seconds; covers sub-millisecond predictor stages up to slow figure builds
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+ENABLED = Config.METRICS_ENABLED
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for label_values, (counts, total) in sorted(self.snapshot().items()):
+            labels = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, label_values))
+            prefix = labels + ',' if labels else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            suffix = f'{{{labels}}}' if labels else ''
+            lines.append(f'{self.name}_sum{suffix} {total!r}')
+            lines.append(f'{self.name}_count{suffix} {cumulative}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+_histograms = {}
+_collectors = []
+_registry_lock = threading.Lock()
+
+
+def histogram(name, help_text, label_names=()):
+    """Get or create a registered histogram"""
+    with _registry_lock:
+        if name not in _histograms:
+            _histograms[name] = Histogram(name, help_text, label_names)
+        return _histograms[name]
+
+
+def register_collector(collect):
+    """Register a callable returning [(name, help, type, {labels}, value), ...] at scrape time"""
+    with _registry_lock:
+        _collectors.append(collect)
+
+
+PREDICTOR_STAGE_SECONDS = histogram(
+    'crop_predictor_stage_seconds', 'Time spent in each CropPredictor stage', ('stage', 'mode'))
+CALLBACK_SECONDS = histogram(
+    'dash_callback_seconds', 'Dash callback latency', ('callback',))
+
+
+@contextmanager
+def timed(hist, *label_values):
+    """Time the enclosed block into hist"""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        hist.observe(time.perf_counter() - start, *label_values)
+
+
+def timed_function(hist, *label_values):
+    """Decorator form of timed()"""
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - start, *label_values)
+        return wrapper
+    return decorator
+
+
+def render_prometheus():
+    """All histograms and collector values in Prometheus text format"""
+    lines = []
+    with _registry_lock:
+        histograms = list(_histograms.values())
+        collectors = list(_collectors)
+    for hist in histograms:
+        lines.extend(hist.render())
+
+    samples = {}
+    for collect in collectors:
+        try:
+            for name, help_text, metric_type, labels, value in collect():
+                samples.setdefault((name, help_text, metric_type), []).append((labels, value))
+        except Exception as e:
+            lines.append(f'# collector error: {_escape(e)}')
+    for (name, help_text, metric_type), values in samples.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        for labels, value in values:
+            label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+    return '\n'.join(lines) + '\n'
@@ -1,12 +1,91 @@
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.linear_model import LinearRegression
+from sklearn.multioutput import MultiOutputRegressor
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 from sklearn.preprocessing import StandardScaler
 import numpy as np
 import pickle
 import os
+import time
 from config import Config
+from models.artifact import save_artifact, load_artifact, check_equivalence, model_keys
+from models.tuning import tune_target
+from models.trend import TrendModelTable
+from concurrent.futures import ProcessPoolExecutor
+
+MODEL_NAMES = ['Linear Regression', 'Random Forest', 'Gradient Boosting']
+TARGETS = ('yield', 'production')
+
+def build_model(name, n_jobs=1, params=None, multi_output=False):
+    """Create a fresh, unfitted candidate model (params override the defaults)
+    
+    multi_output=True returns an estimator that fits a 2-D target; linear
+    models and forests do this natively, boosting gets one model per column.
+    """
+    params = params or {}
+    if name == 'Linear Regression':
+        return LinearRegression(**params)
+    if name == 'Random Forest':
+        return RandomForestRegressor(**{'n_estimators': 100, 'random_state': 42, 'n_jobs': n_jobs, **params})
+    if name == 'Gradient Boosting':
+        model = GradientBoostingRegressor(**{'n_estimators': 100, 'random_state': 42, **params})
+        return MultiOutputRegressor(model) if multi_output else model
+    raise ValueError(f"Unknown model: {name}")
+
+def _fit_candidate(name, X_train, y_train, X_test, y_test, forest_jobs=1):
+    """Fit one candidate and score it on the test split (runs in worker processes)"""
+    model = build_model(name, n_jobs=forest_jobs)
+    model.fit(X_train, y_train)
+    if hasattr(model, 'n_jobs'):
+        # Don't carry the training thread count into serving
+        model.n_jobs = None
+    y_pred_test = model.predict(X_test)
+    
+    return {
+        'model': model,
+        'test_r2': r2_score(y_test, y_pred_test),
+        'test_rmse': np.sqrt(mean_squared_error(y_test, y_pred_test)),
+        'test_mae': mean_absolute_error(y_test, y_pred_test),
+        'residual_quantiles': residual_quantiles(y_test, y_pred_test)
+    }
+
+def _fit_multi_output_candidate(name, X_train, Y_train, X_test, Y_test, target_scaler, forest_jobs=1):
+    """Fit one candidate on all (standardized) targets at once and score each target"""
+    model = build_model(name, n_jobs=forest_jobs, multi_output=True)
+    model.fit(X_train, Y_train)
+    if hasattr(model, 'n_jobs'):
+        model.n_jobs = None
+    Y_pred = target_scaler.inverse_transform(model.predict(X_test))
+    
+    scores = {}
+    for i, target in enumerate(TARGETS):
+        scores[target] = {
+            'test_r2': r2_score(Y_test[:, i], Y_pred[:, i]),
+            'test_rmse': np.sqrt(mean_squared_error(Y_test[:, i], Y_pred[:, i])),
+            'test_mae': mean_absolute_error(Y_test[:, i], Y_pred[:, i]),
+            'residual_quantiles': residual_quantiles(Y_test[:, i], Y_pred[:, i])
+        }
+    return {
+        'model': model,
+        'targets': scores,
+        'test_r2': float(np.mean([scores[target]['test_r2'] for target in TARGETS]))
+    }
+
+def residual_quantiles(y_true, y_pred, coverage=None):
+    """(low, high) quantiles of held-out residuals; added to a prediction they give its band"""
+    coverage = coverage or Config.PREDICTION_INTERVAL
+    tail = (1 - coverage) / 2
+    residuals = np.asarray(y_true, dtype=float) - np.asarray(y_pred, dtype=float)
+    return tuple(float(q) for q in np.quantile(residuals, [tail, 1 - tail]))
+
+def interval_spec(name, residuals):
+    """How serving should build intervals for the chosen model (see CropPredictor)"""
+    return {
+        'method': 'trees' if name == 'Random Forest' else 'residual',
+        'coverage': Config.PREDICTION_INTERVAL,
+        'residual_quantiles': residuals
+    }
 
 class ModelTrainer:
     def __init__(self, data_processor):
@@ -14,11 +93,29 @@ class ModelTrainer:
         self.config = Config()
         self.models = {}
         self.scalers = {}
+        self.best_params = None
+        self.trend_models = None
+        self.intervals = {}
+        # Single scaler + multi-output model for both targets (see train_multi_output)
+        self.pipeline = None
         
-    def train_models(self, X_yield, y_yield, X_production, y_production):
-        """Train models for both yield and production prediction"""
+    def train_models(self, X_yield, y_yield, X_production, y_production, n_jobs=1, multi_output=True):
+        """Train models for both yield and production prediction
+        
+        When both targets share the same feature rows (as prepare_features
+        returns them) and multi_output is set, one pipeline is fitted for
+        both targets (train_multi_output); otherwise each target gets its own
+        scaler and model.
+        
+        With n_jobs != 1 the candidate x target fits run in a process pool and
+        the forests use the remaining cores; -1 means all cores. Results are
+        identical to a sequential run since every model keeps random_state=42.
+        """
+        if multi_output and X_yield.index.equals(X_production.index) and X_yield.equals(X_production):
+            return self.train_multi_output(X_yield, y_yield, y_production, n_jobs=n_jobs)
         
         print(f"Training with {len(X_yield)} yield samples and {len(X_production)} production samples...")
+        self.pipeline = None
         
         # Scale features
         self.scalers['yield'] = StandardScaler()
@@ -36,54 +133,38 @@ class ModelTrainer:
             X_production_scaled, y_production, test_size=0.2, random_state=42
         )
         
-        # Initialize models
-        model_types = {
-            'Linear Regression': LinearRegression(),
-            'Random Forest': RandomForestRegressor(n_estimators=100, random_state=42),
-            'Gradient Boosting': GradientBoostingRegressor(n_estimators=100, random_state=42)
+        splits = {
+            'yield': (X_train_y, y_train_y, X_test_y, y_test_y),
+            'production': (X_train_p, y_train_p, X_test_p, y_test_p)
         }
+        tasks = [(target, name) for target in splits for name in MODEL_NAMES]
         
-        # Train yield models
-        print("Training Yield Models...")
-        yield_results = {}
-        for name, model in model_types.items():
-            print(f"  - Training {name}...")
-            model.fit(X_train_y, y_train_y)
-            y_pred_test = model.predict(X_test_y)
-            
-            r2_score_val = r2_score(y_test_y, y_pred_test)
-            yield_results[name] = {
-                'model': model,
-                'test_r2': r2_score_val,
-                'test_rmse': np.sqrt(mean_squared_error(y_test_y, y_pred_test)),
-                'test_mae': mean_absolute_error(y_test_y, y_pred_test)
-            }
-            print(f"    R² Score: {r2_score_val:.4f}")
-        
-        # Train production models
-        print("Training Production Models...")
-        production_results = {}
-        for name, model in model_types.items():
-            print(f"  - Training {name}...")
-            # Create fresh model instance
-            if name == 'Linear Regression':
-                model_copy = LinearRegression()
-            elif name == 'Random Forest':
-                model_copy = RandomForestRegressor(n_estimators=100, random_state=42)
-            else:
-                model_copy = GradientBoostingRegressor(n_estimators=100, random_state=42)
-                
-            model_copy.fit(X_train_p, y_train_p)
-            y_pred_test = model_copy.predict(X_test_p)
-            
-            r2_score_val = r2_score(y_test_p, y_pred_test)
-            production_results[name] = {
-                'model': model_copy,
-                'test_r2': r2_score_val,
-                'test_rmse': np.sqrt(mean_squared_error(y_test_p, y_pred_test)),
-                'test_mae': mean_absolute_error(y_test_p, y_pred_test)
-            }
-            print(f"    R² Score: {r2_score_val:.4f}")
+        n_jobs = (os.cpu_count() or 1) if n_jobs in (None, -1) else max(1, n_jobs)
+        results = {'yield': {}, 'production': {}}
+        
+        if n_jobs == 1:
+            for target, name in tasks:
+                if name == MODEL_NAMES[0]:
+                    print(f"Training {target.capitalize()} Models...")
+                print(f"  - Training {name} ({target})...")
+                results[target][name] = _fit_candidate(name, *splits[target], forest_jobs=1)
+                print(f"    R² Score: {results[target][name]['test_r2']:.4f}")
+        else:
+            workers = min(n_jobs, len(tasks))
+            forest_jobs = max(1, n_jobs // workers)
+            print(f"Training {len(tasks)} models on {workers} processes ({forest_jobs} threads per forest)...")
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    (target, name): pool.submit(_fit_candidate, name, *splits[target], forest_jobs=forest_jobs)
+                    for target, name in tasks
+                }
+                # Collect in task order so output and tie-breaking are deterministic
+                for target, name in tasks:
+                    results[target][name] = futures[(target, name)].result()
+                    print(f"  - {name} ({target}) R² Score: {results[target][name]['test_r2']:.4f}")
+        
+        yield_results = results['yield']
+        production_results = results['production']
         
         # Select best models
         best_yield_model = max(yield_results.keys(), key=lambda x: yield_results[x]['test_r2'])
@@ -95,28 +176,173 @@ class ModelTrainer:
         
         self.models['yield'] = yield_results[best_yield_model]['model']
         self.models['production'] = production_results[best_production_model]['model']
+        self.intervals = {
+            'yield': interval_spec(best_yield_model, yield_results[best_yield_model]['residual_quantiles']),
+            'production': interval_spec(best_production_model,
+                                        production_results[best_production_model]['residual_quantiles'])
+        }
         
+        self.fit_trend_models(X_yield, y_yield, X_production, y_production)
         return yield_results, production_results
     
-    def save_models(self):
-        """Save trained models and preprocessors"""
-        try:
-            # Ensure directory exists
-            os.makedirs(self.config.MODEL_DIR, exist_ok=True)
-            
-            # Get baseline year for normalization
-            baseline_year = 2015  # Based on your data starting from 2015
+    def train_multi_output(self, X, y_yield, y_production, n_jobs=1):
+        """Fit one scaler and one multi-output model for yield and production
+        
+        Features are scaled and split once, and each candidate is fitted once
+        on both targets. Targets are standardized first so the larger
+        production values don't dominate the shared tree splits; the chosen
+        candidate is the one with the best mean test R² over the targets.
+        Returns per-target views of the results, like train_models.
+        """
+        print(f"Training with {len(X)} samples for {' and '.join(TARGETS)} (multi-output)...")
+        
+        feature_scaler = StandardScaler()
+        target_scaler = StandardScaler()
+        X_scaled = feature_scaler.fit_transform(X)
+        Y = np.column_stack([np.asarray(y_yield, dtype=float), np.asarray(y_production, dtype=float)])
+        target_scaler.fit(Y)
+        
+        X_train, X_test, Y_train, Y_test = train_test_split(X_scaled, Y, test_size=0.2, random_state=42)
+        Y_train = target_scaler.transform(Y_train)
+        split = (X_train, Y_train, X_test, Y_test, target_scaler)
+        
+        n_jobs = (os.cpu_count() or 1) if n_jobs in (None, -1) else max(1, n_jobs)
+        results = {}
+        if n_jobs == 1:
+            for name in MODEL_NAMES:
+                print(f"  - Training {name}...")
+                results[name] = _fit_multi_output_candidate(name, *split, forest_jobs=1)
+                print(f"    R² Score: " + ", ".join(
+                    f"{target} {results[name]['targets'][target]['test_r2']:.4f}" for target in TARGETS))
+        else:
+            workers = min(n_jobs, len(MODEL_NAMES))
+            forest_jobs = max(1, n_jobs // workers)
+            print(f"Training {len(MODEL_NAMES)} models on {workers} processes ({forest_jobs} threads per forest)...")
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {name: pool.submit(_fit_multi_output_candidate, name, *split, forest_jobs=forest_jobs)
+                           for name in MODEL_NAMES}
+                for name in MODEL_NAMES:
+                    results[name] = futures[name].result()
+                    print(f"  - {name} R² Score: " + ", ".join(
+                        f"{target} {results[name]['targets'][target]['test_r2']:.4f}" for target in TARGETS))
+        
+        best = max(MODEL_NAMES, key=lambda name: results[name]['test_r2'])
+        print(f"\nBest Model Selected: {best} (mean R² = {results[best]['test_r2']:.4f})")
+        
+        self.pipeline = {
+            'scaler': feature_scaler,
+            'target_scaler': target_scaler,
+            'model': results[best]['model'],
+            'targets': TARGETS
+        }
+        self.models, self.scalers = {}, {}
+        self.intervals = {target: interval_spec(best, results[best]['targets'][target]['residual_quantiles'])
+                          for target in TARGETS}
+        
+        self.fit_trend_models(X, y_yield, X, y_production)
+        
+        per_target = {target: {name: dict(results[name]['targets'][target], model=results[name]['model'])
+                               for name in MODEL_NAMES}
+                      for target in TARGETS}
+        return per_target['yield'], per_target['production']
+    
+    def tune_models(self, X_yield, y_yield, X_production, y_production, n_jobs=1,
+                    n_folds=None, factor=None, cache_dir=None):
+        """Pick model family and hyperparameters per target with time-aware CV
+        
+        Candidates are ranked by rolling-origin RMSE (train on years <= t,
+        test on t+1) using successive halving, with fold results memoized in
+        Config.TUNING_CACHE_DIR. The winner for each target is refit on all
+        rows and recorded in self.best_params, which save_models stores.
+        """
+        n_folds = n_folds or self.config.TUNING_FOLDS
+        factor = factor or self.config.TUNING_HALVING_FACTOR
+        cache_dir = cache_dir or self.config.TUNING_CACHE_DIR
+        
+        self.best_params = {}
+        # Tuning picks a family per target, so it saves the two-model layout
+        self.pipeline = None
+        all_results = {}
+        for target, X, y in (('yield', X_yield, y_yield), ('production', X_production, y_production)):
+            print(f"Tuning {target.capitalize()} Models ({n_folds} rolling-origin folds)...")
+            years = np.asarray(X['Year_normalized']) + 2015
+            ranked, cache = tune_target(X, y, years, n_folds=n_folds, factor=factor, n_jobs=n_jobs,
+                                        cache_dir=cache_dir, label=f"{target}: ")
+            print(f"  - Fold cache: {cache.hits} hits, {cache.misses} misses")
             
+            best = ranked[0]
+            self.scalers[target] = StandardScaler()
+            model = build_model(best['model'], n_jobs=n_jobs or 1,
+                                params=best['params'])
+            model.fit(self.scalers[target].fit_transform(X), y)
+            if hasattr(model, 'n_jobs'):
+                model.n_jobs = None
+            self.models[target] = model
+            self.best_params[target] = best
+            self.intervals[target] = interval_spec(best['model'], best.get('residual_quantiles'))
+            all_results[target] = ranked
+            print(f"  Best: {best['model']} {best['params']} "
+                  f"(CV RMSE = {best['cv_rmse']:.4f}, R² = {best['cv_r2']:.4f})")
+        
+        self.fit_trend_models(X_yield, y_yield, X_production, y_production)
+        return all_results['yield'], all_results['production']
+    
+    def fit_trend_models(self, X_yield, y_yield, X_production, y_production):
+        """Fit the per-(Crop, Season) trend engine (see models.trend) for both targets"""
+        start = time.perf_counter()
+        # Union of both targets' rows (prepare_features gives them the same rows)
+        X = X_yield.combine_first(X_production)
+        self.trend_models = TrendModelTable.fit(
+            X['Crop_encoded'], X['Season_encoded'], X['Year_normalized'], X['Area'],
+            {'yield': y_yield.reindex(X.index), 'production': y_production.reindex(X.index)},
+            n_crops=len(self.data_processor.le_crop.classes_),
+            n_seasons=len(self.data_processor.le_season.classes_),
+            min_rows=self.config.TREND_MIN_ROWS
+        )
+        coverage = self.trend_models.coverage()
+        print(f"Trend models: {self.trend_models.counts.shape[0] * self.trend_models.counts.shape[1]} "
+              f"crop x season series fitted in {(time.perf_counter() - start) * 1000:.1f} ms "
+              f"({coverage['yield']:.0%} with their own data)")
+        return self.trend_models
+    
+    def models_to_save(self):
+        """The dict save_models writes: the multi-output pipeline (model,
+        scaler, target_scaler, targets) or the two-model layout, plus encoders"""
+        # Get baseline year for normalization
+        baseline_year = 2015  # Based on your data starting from 2015
+        
+        if self.pipeline is not None:
+            models_to_save = dict(self.pipeline)
+        else:
             models_to_save = {
                 'yield_model': self.models['yield'],
                 'production_model': self.models['production'],
                 'yield_scaler': self.scalers['yield'],
-                'production_scaler': self.scalers['production'],
-                'crop_encoder': self.data_processor.le_crop,
-                'season_encoder': self.data_processor.le_season,
-                'feature_names': ['Crop_encoded', 'Season_encoded', 'Area', 'Year_normalized'],
-                'baseline_year': baseline_year
+                'production_scaler': self.scalers['production']
             }
+        models_to_save.update({
+            'crop_encoder': self.data_processor.le_crop,
+            'season_encoder': self.data_processor.le_season,
+            'feature_names': ['Crop_encoded', 'Season_encoded', 'Area', 'Year_normalized'],
+            'baseline_year': baseline_year
+        })
+        return models_to_save
+    
+    def save_models(self):
+        """Save trained models and preprocessors"""
+        try:
+            # Ensure directory exists
+            os.makedirs(self.config.MODEL_DIR, exist_ok=True)
+            
+            models_to_save = self.models_to_save()
+            if self.best_params:
+                # Winning family, params and CV scores from tune_models
+                models_to_save['best_params'] = self.best_params
+            if self.intervals:
+                # Interval method and held-out residual quantiles per target
+                models_to_save['intervals'] = self.intervals
+            if self.trend_models is not None:
+                models_to_save['trend_models'] = self.trend_models
             
             # Save to pickle file
             with open(self.config.MODEL_FILE, 'wb') as f:
@@ -129,6 +355,14 @@ class ModelTrainer:
                 test_load = pickle.load(f)
             print("✅ Model save verification successful!")
             
+            # Save memory-mappable artifact for serving
+            save_artifact(models_to_save, self.config.MODEL_ARTIFACT_DIR)
+            mapped = load_artifact(self.config.MODEL_ARTIFACT_DIR)
+            for key, _ in model_keys(models_to_save):
+                check_equivalence(models_to_save[key], mapped[key],
+                                  n_features=len(models_to_save['feature_names']))
+            print(f"✅ Mappable artifact saved to {self.config.MODEL_ARTIFACT_DIR}")
+            
         except Exception as e:
             print(f"❌ Error saving models: {e}")
             import traceback
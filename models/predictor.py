@@ -1,78 +1,460 @@
 import pickle
+import threading
+from collections import namedtuple
+from types import MappingProxyType
 import numpy as np
 import pandas as pd
 from config import Config
+from models.cache import LRUCache
+from models.artifact import artifact_exists, load_artifact, compile_tree_ensemble, check_equivalence, model_keys
+from models.batcher import MicroBatcher
+from models.surface import load_surface
+from models.publish import resolve
+from models.metrics import PREDICTOR_STAGE_SECONDS, timed
 import os
+import time
+
+# Interval bounds returned next to predicted_yield / predicted_production (when available)
+INTERVAL_KEYS = ('yield_lower', 'yield_upper', 'production_lower', 'production_upper')
+
+# Everything a prediction reads from the loaded models. A reload builds a new
+# snapshot and publishes it with one attribute assignment, so request threads
+# read self._snapshot once, without a lock, and never see a half-updated set
+# of models. generation tags prediction cache entries with their snapshot.
+ModelSnapshot = namedtuple('ModelSnapshot', ['models', 'surface', 'generation'])
+
+def prediction_result(crop, season, area, year, values):
+    """Result dict of one prediction, shared by the direct and micro-batched paths
+    
+    values maps predicted_yield, predicted_production and productivity, plus
+    any interval bounds and their {target}_coverage, to final numbers; bounds
+    that are missing or NaN are left out, and so is the coverage of a target
+    without bounds.
+    """
+    result = {
+        'crop': crop,
+        'season': season,
+        'area': area,
+        'year': year,
+        'predicted_yield': values['predicted_yield'],
+        'predicted_production': values['predicted_production'],
+        'productivity': values['productivity']
+    }
+    for name in INTERVAL_KEYS:
+        if values.get(name) is not None and not pd.isna(values[name]):
+            result[name] = values[name]
+    for target in ('yield', 'production'):
+        if f'{target}_lower' in result and values.get(f'{target}_coverage') is not None:
+            result[f'{target}_coverage'] = values[f'{target}_coverage']
+    return result
 
 class CropPredictor:
-    def __init__(self):
+    def __init__(self, cache_size=None, micro_batch=None, engine=None):
         self.config = Config()
-        self.models = None
+        self._snapshot = ModelSnapshot(None, None, 0)
+        # Serializes writers (reloads) only; predictions never take it
+        self._reload_lock = threading.Lock()
+        self.load_seconds = None
+        # 'model' (global tree/linear models) or 'trend' (per crop x season trends)
+        self.engine = engine or self.config.PREDICTION_ENGINE
+        if cache_size is None:
+            cache_size = self.config.PREDICTION_CACHE_SIZE
+        self.cache = LRUCache(cache_size)
+        if micro_batch is None:
+            micro_batch = self.config.MICRO_BATCH_ENABLED
+        # Concurrent cache misses are coalesced into one predict_batch call
+        self.batcher = MicroBatcher(
+            self.predict_batch,
+            prediction_result,
+            max_batch_size=self.config.MICRO_BATCH_MAX_SIZE,
+            max_wait_ms=self.config.MICRO_BATCH_MAX_WAIT_MS
+        ) if micro_batch else None
         self.load_models()
         
+    @property
+    def models(self):
+        """Read-only models dict of the current snapshot (None when nothing is loaded)"""
+        return self._snapshot.models
+    
+    @models.setter
+    def models(self, models):
+        # A surface belongs to the models it was built from, so it is dropped
+        with self._reload_lock:
+            self._publish(models, None)
+    
+    @property
+    def surface(self):
+        """Prediction surface of the current snapshot"""
+        return self._snapshot.surface
+    
+    @surface.setter
+    def surface(self, surface):
+        with self._reload_lock:
+            self._publish(self._snapshot.models, surface)
+    
+    def _publish(self, models, surface):
+        """Swap in a new snapshot (callers hold _reload_lock)"""
+        models = None if models is None else MappingProxyType(dict(models))
+        self._snapshot = ModelSnapshot(models, surface, self._snapshot.generation + 1)
+        # Entries of older generations can't be hit any more; free them
+        self.cache.clear()
+    
     def load_models(self):
-        """Load saved models and preprocessors"""
+        """Load saved models and preprocessors
+        
+        Safe to call while other threads predict: the new models and surface
+        are loaded aside and swapped in together. If loading fails, the
+        previous models stay in service.
+        """
+        with self._reload_lock:
+            start = time.perf_counter()
+            models = surface = None
+            try:
+                if artifact_exists(self.config.MODEL_ARTIFACT_DIR):
+                    # Models and surface from the same artifact version, even if a save switches it now
+                    artifact_dir = resolve(self.config.MODEL_ARTIFACT_DIR)
+                    models = load_artifact(artifact_dir)
+                    print("✅ Models loaded successfully (memory-mapped artifact)!")
+                    if self.config.PREDICTION_SURFACE_ENABLED:
+                        surface = load_surface(artifact_dir, self.engine,
+                                               self.config.SURFACE_MAX_RELATIVE_ERROR)
+                elif os.path.exists(self.config.MODEL_FILE):
+                    with open(self.config.MODEL_FILE, 'rb') as f:
+                        models = pickle.load(f)
+                    if self.config.COMPILE_TREE_MODELS:
+                        models = self._compile_models(models)
+                    print("✅ Models loaded successfully!")
+                else:
+                    print("⚠️ No saved models found. Models will be trained automatically.")
+                if models and self.engine == 'trend' and 'trend_models' not in models:
+                    print("⚠️ Saved models have no trend table; using the global models instead.")
+            except Exception as e:
+                print(f"❌ Error loading models: {e}")
+                return
+            finally:
+                self.load_seconds = time.perf_counter() - start
+            self._publish(models, surface)
+    
+    @staticmethod
+    def _compile_models(models):
+        """Swap pickled sklearn tree ensembles for the array engine where it predicts identically"""
+        n_features = len(models.get('feature_names', ())) or 4
+        for key, _ in model_keys(models):
+            try:
+                compiled = compile_tree_ensemble(models[key])
+                check_equivalence(models[key], compiled, n_features=n_features)
+            except (NotImplementedError, AttributeError, KeyError):
+                continue
+            except ValueError as e:
+                print(f"⚠️ Keeping sklearn {key}: {e}")
+                continue
+            models[key] = compiled
+        return models
+    
+    @staticmethod
+    def _cache_key(crop, season, area, year):
+        """Cache key of a request, or None if it cannot be hashed
+        
+        Inputs are kept as given, not converted: _predict_uncached uses them
+        verbatim, so ' Rice' must not share an entry with 'Rice', nor the
+        string '2020' (an error) with the number 2020. Numbers that compare
+        equal (2020, 2020.0, np.int64(2020)) also predict the same.
+        """
         try:
-            if os.path.exists(self.config.MODEL_FILE):
-                with open(self.config.MODEL_FILE, 'rb') as f:
-                    self.models = pickle.load(f)
-                print("✅ Models loaded successfully!")
-            else:
-                print("⚠️ No saved models found. Models will be trained automatically.")
-                self.models = None
-        except Exception as e:
-            print(f"❌ Error loading models: {e}")
-            self.models = None
+            key = (crop, season, area, year)
+            hash(key)
+            return key
+        except TypeError:
+            return None
+    
+    def cache_stats(self):
+        """Return prediction cache hit/miss/eviction counters"""
+        return self.cache.stats()
+    
+    def batch_stats(self):
+        """Return micro-batching metrics (None when micro-batching is off)"""
+        return self.batcher.stats() if self.batcher else None
     
     def predict(self, crop, season, area, year):
         """Make predictions for given inputs"""
-        if not self.models:
+        snapshot = self._snapshot
+        if not snapshot.models:
             return {'error': 'Models not loaded. Please train models first.'}
         
+        with timed(PREDICTOR_STAGE_SECONDS, 'total', 'single'):
+            key = self._cache_key(crop, season, area, year)
+            if key is not None:
+                key = (snapshot.generation,) + key
+                cached = self.cache.get(key)
+                if cached is not None:
+                    return dict(cached, area=area, year=year)
+            
+            if self.batcher is not None:
+                result = self.batcher.submit(crop, season, area, year)
+            else:
+                result = self._predict_uncached(snapshot, crop, season, area, year)
+            if key is not None and 'error' not in result:
+                self.cache.put(key, dict(result))
+            return result
+    
+    def _predict_uncached(self, snapshot, crop, season, area, year):
+        """Run the snapshot's models for a single input"""
+        models = snapshot.models
         try:
             # Encode categorical variables
-            if crop not in self.models['crop_encoder'].classes_:
+            if crop not in models['crop_encoder'].classes_:
                 return {'error': f'Unknown crop: {crop}'}
-            if season not in self.models['season_encoder'].classes_:
+            if season not in models['season_encoder'].classes_:
                 return {'error': f'Unknown season: {season}'}
-                
-            crop_encoded = self.models['crop_encoder'].transform([crop])[0]
-            season_encoded = self.models['season_encoder'].transform([season])[0]
+            
+            with timed(PREDICTOR_STAGE_SECONDS, 'encode', 'single'):
+                crop_encoded = models['crop_encoder'].transform([crop])[0]
+                season_encoded = models['season_encoder'].transform([season])[0]
             # Use the same baseline year as training (2015)
-            baseline_year = self.models.get('baseline_year', 2015)
+            baseline_year = models.get('baseline_year', 2015)
             year_normalized = year - baseline_year
             
             # Create feature vector
             features = np.array([[crop_encoded, season_encoded, area, year_normalized]])
             
-            # Scale features
-            features_yield_scaled = self.models['yield_scaler'].transform(features)
-            features_production_scaled = self.models['production_scaler'].transform(features)
-            
-            # Make predictions
-            predicted_yield = self.models['yield_model'].predict(features_yield_scaled)[0]
-            predicted_production = self.models['production_model'].predict(features_production_scaled)[0]
+            # Scale features and make predictions
+            scores = self._predict_features(features, 'single', snapshot)
+            predicted_yield = scores['yield'][0]
+            predicted_production = scores['production'][0]
+            if np.isnan(predicted_yield) or np.isnan(predicted_production):
+                return {'error': f'No trend data for crop: {crop}'}
             
             # Ensure positive predictions
             predicted_yield = max(0, predicted_yield)
             predicted_production = max(0, predicted_production)
             
-            return {
-                'crop': crop,
-                'season': season,
-                'area': area,
-                'year': year,
+            values = {
                 'predicted_yield': round(predicted_yield, 2),
                 'predicted_production': round(predicted_production, 2),
                 'productivity': round(predicted_production / area, 2) if area > 0 else 0
             }
+            for name in INTERVAL_KEYS:
+                if name in scores:
+                    values[name] = round(max(0, scores[name][0]), 2)
+            for target in ('yield', 'production'):
+                values[f'{target}_coverage'] = self._interval_coverage(models, target)
+            return prediction_result(crop, season, area, year, values)
         
         except Exception as e:
             return {'error': f'Prediction failed: {str(e)}'}
     
+    def _predict_features(self, features, mode='batch', snapshot=None):
+        """Predict grid inputs from the precomputed surface and all others with the live models"""
+        snapshot = snapshot or self._snapshot
+        surface = snapshot.surface
+        if surface is None:
+            return self._score_features(features, mode, snapshot)
+        
+        inside = surface.covers(features[:, 3], features[:, 2])
+        if inside.all():
+            with timed(PREDICTOR_STAGE_SECONDS, 'surface_lookup', mode):
+                return surface.lookup(features[:, 0], features[:, 1], features[:, 3], features[:, 2])
+        
+        live = self._score_features(features[~inside], mode, snapshot)
+        if not inside.any():
+            return live
+        grid = features[inside]
+        with timed(PREDICTOR_STAGE_SECONDS, 'surface_lookup', mode):
+            looked_up = surface.lookup(grid[:, 0], grid[:, 1], grid[:, 3], grid[:, 2])
+        scores = {}
+        for name in live.keys() & looked_up.keys():
+            scores[name] = np.empty(len(features))
+            scores[name][inside] = looked_up[name]
+            scores[name][~inside] = live[name]
+        return scores
+    
+    def _score_features(self, features, mode='batch', snapshot=None):
+        """Scale a feature matrix and run the model(s) over it in one pass
+        
+        Returns {'yield': ..., 'production': ...} arrays plus <target>_lower /
+        <target>_upper interval bounds for targets that have an interval.
+        """
+        models = (snapshot or self._snapshot).models
+        trend_models = models.get('trend_models') if self.engine == 'trend' else None
+        if trend_models is not None:
+            # Coefficient lookup by (crop, season) code; no scaling needed
+            with timed(PREDICTOR_STAGE_SECONDS, 'model_predict', mode):
+                predictions = trend_models.predict(features[:, 0].astype(int), features[:, 1].astype(int),
+                                                   features[:, 3], features[:, 2])
+            return {target: predictions[:, trend_models.targets.index(target)]
+                    for target in ('yield', 'production')}
+        
+        if 'model' in models:
+            # Multi-output pipeline: one scaling pass and one model call for both targets
+            with timed(PREDICTOR_STAGE_SECONDS, 'scale', mode):
+                scaled = models['scaler'].transform(features)
+            with timed(PREDICTOR_STAGE_SECONDS, 'model_predict', mode):
+                return self._score_model(models, models['model'], scaled, models['targets'],
+                                         models.get('target_scaler'))
+        
+        with timed(PREDICTOR_STAGE_SECONDS, 'scale', mode):
+            scaled = {target: models[f'{target}_scaler'].transform(features)
+                      for target in ('yield', 'production')}
+        
+        scores = {}
+        with timed(PREDICTOR_STAGE_SECONDS, 'model_predict', mode):
+            for target in ('yield', 'production'):
+                scores.update(self._score_model(models, models[f'{target}_model'], scaled[target], (target,)))
+        return scores
+    
+    def _interval_coverage(self, models, target):
+        """Coverage the target's interval was built for (recorded at training time)"""
+        spec = models.get('intervals', {}).get(target)
+        return spec['coverage'] if spec else self.config.PREDICTION_INTERVAL
+    
+    def _score_model(self, models, model, X, targets, target_scaler=None):
+        """Point predictions and, when possible, interval bounds for the model's targets
+        
+        Forests on the array engine take quantiles across their trees in the
+        same traversal; other models add the held-out residual quantiles
+        recorded at training time. target_scaler undoes target
+        standardization of a multi-output model.
+        """
+        specs = [models.get('intervals', {}).get(target) for target in targets]
+        coverage = self._interval_coverage(models, targets[0])
+        outputs = None
+        
+        if hasattr(model, 'predict_interval') and all(spec is None or spec['method'] == 'trees' for spec in specs):
+            tail = (1 - coverage) / 2
+            try:
+                outputs = model.predict_interval(X, (tail, 1 - tail))
+            except NotImplementedError:
+                pass
+        if outputs is None:
+            outputs = (model.predict(X),)
+        
+        # (rows, targets) arrays in target units: point first, then low/high if from trees
+        outputs = [np.asarray(values, dtype=float).reshape(len(X), len(targets)) for values in outputs]
+        if target_scaler is not None:
+            outputs = [target_scaler.inverse_transform(values) for values in outputs]
+        
+        scores = {}
+        for i, (target, spec) in enumerate(zip(targets, specs)):
+            point = scores[target] = outputs[0][:, i]
+            if len(outputs) == 3:
+                scores[f'{target}_lower'] = outputs[1][:, i]
+                scores[f'{target}_upper'] = outputs[2][:, i]
+            elif spec and spec.get('residual_quantiles'):
+                low, high = spec['residual_quantiles']
+                scores[f'{target}_lower'] = point + low
+                scores[f'{target}_upper'] = point + high
+        return scores
+    
+    def predict_batch(self, data=None, crop=None, season=None, area=None, year=None):
+        """Make predictions for many inputs at once
+        
+        Accepts either a DataFrame with crop/season/area/year columns (any
+        capitalisation) or the four columns as separate array-likes. Rows with
+        unknown crops/seasons or invalid numbers get a message in the 'error'
+        column instead of failing the whole batch.
+        """
+        with timed(PREDICTOR_STAGE_SECONDS, 'total', 'batch'):
+            return self._predict_batch(data, crop, season, area, year)
+    
+    def _predict_batch(self, data, crop, season, area, year):
+        """Vectorized implementation behind predict_batch"""
+        snapshot = self._snapshot
+        models = snapshot.models
+        if not models:
+            return {'error': 'Models not loaded. Please train models first.'}
+        
+        try:
+            if data is not None:
+                columns = {str(col).lower(): col for col in data.columns}
+                missing = [name for name in ('crop', 'season', 'area', 'year') if name not in columns]
+                if missing:
+                    return {'error': f'Missing input columns: {missing}'}
+                crop, season, area, year = (data[columns[name]].to_numpy()
+                                            for name in ('crop', 'season', 'area', 'year'))
+            
+            crops = np.asarray(crop, dtype=object).ravel()
+            seasons = np.asarray(season, dtype=object).ravel()
+            areas = pd.to_numeric(pd.Series(np.asarray(area).ravel()), errors='coerce').to_numpy(dtype=float)
+            years = pd.to_numeric(pd.Series(np.asarray(year).ravel()), errors='coerce').to_numpy(dtype=float)
+            
+            n_rows = len(crops)
+            if not (len(seasons) == len(areas) == len(years) == n_rows):
+                return {'error': 'Input columns must all have the same length'}
+            
+            crop_classes = models['crop_encoder'].classes_
+            season_classes = models['season_encoder'].classes_
+            
+            # Build per-row error messages; the first problem found wins
+            errors = np.full(n_rows, None, dtype=object)
+            bad_year = np.isnan(years)
+            bad_area = np.isnan(areas)
+            bad_season = ~np.isin(seasons, season_classes)
+            bad_crop = ~np.isin(crops, crop_classes)
+            errors[bad_year] = 'Invalid year'
+            errors[bad_area] = 'Invalid area'
+            errors[bad_season] = np.array([f'Unknown season: {s}' for s in seasons[bad_season]], dtype=object)
+            errors[bad_crop] = np.array([f'Unknown crop: {c}' for c in crops[bad_crop]], dtype=object)
+            valid = ~(bad_year | bad_area | bad_season | bad_crop)
+            
+            predicted_yield = np.full(n_rows, np.nan)
+            predicted_production = np.full(n_rows, np.nan)
+            bounds = {name: np.full(n_rows, np.nan) for name in INTERVAL_KEYS}
+            
+            if valid.any():
+                with timed(PREDICTOR_STAGE_SECONDS, 'encode', 'batch'):
+                    # LabelEncoder classes_ are sorted, so searchsorted is the encoding
+                    crop_encoded = np.searchsorted(crop_classes, crops[valid])
+                    season_encoded = np.searchsorted(season_classes, seasons[valid])
+                    baseline_year = models.get('baseline_year', 2015)
+                    
+                    features = np.column_stack([
+                        crop_encoded, season_encoded, areas[valid], years[valid] - baseline_year
+                    ]).astype(float)
+                
+                scores = self._predict_features(features, 'batch', snapshot)
+                missing = np.flatnonzero(valid)[np.isnan(scores['yield']) | np.isnan(scores['production'])]
+                errors[missing] = np.array([f'No trend data for crop: {c}' for c in crops[missing]],
+                                           dtype=object)
+                
+                # Ensure positive predictions
+                predicted_yield[valid] = np.maximum(scores['yield'], 0)
+                predicted_production[valid] = np.maximum(scores['production'], 0)
+                for name in INTERVAL_KEYS:
+                    if name in scores:
+                        bounds[name][valid] = np.round(np.maximum(scores[name], 0), 2)
+            
+            with np.errstate(divide='ignore', invalid='ignore'):
+                productivity = np.where(areas > 0, np.round(predicted_production / areas, 2), 0.0)
+            productivity[~valid] = np.nan
+            predicted_yield = np.round(predicted_yield, 2)
+            predicted_production = np.round(predicted_production, 2)
+            # Coverage the bounds were built for, on rows that have bounds
+            coverage = {
+                f'{target}_coverage': np.where(np.isnan(bounds[f'{target}_lower']), np.nan,
+                                               self._interval_coverage(models, target))
+                for target in ('yield', 'production')
+            }
+            
+            return pd.DataFrame({
+                'crop': crops,
+                'season': seasons,
+                'area': areas,
+                'year': years,
+                'predicted_yield': predicted_yield,
+                'predicted_production': predicted_production,
+                'productivity': productivity,
+                **bounds,
+                **coverage,
+                'error': errors
+            })
+        
+        except Exception as e:
+            return {'error': f'Batch prediction failed: {str(e)}'}
+    
     def get_available_options(self):
         """Get available crops and seasons"""
-        if not self.models:
+        models = self.models
+        if not models:
             # Return default options if models aren't loaded
             return {
                 'crops': ['Rice', 'Wheat', 'Cotton', 'Sugarcane', 'Maize'],
@@ -81,8 +463,8 @@ class CropPredictor:
         
         try:
             return {
-                'crops': list(self.models['crop_encoder'].classes_),
-                'seasons': list(self.models['season_encoder'].classes_)
+                'crops': list(models['crop_encoder'].classes_),
+                'seasons': list(models['season_encoder'].classes_)
             }
         except Exception as e:
             print(f"Error getting options: {e}")
@@ -0,0 +1,101 @@
+"""
+Atomic publishing of memory-mapped directories.
+
+Files that running processes have memory-mapped must never be rewritten in
+place: the mappings would see the new bytes immediately (or fault with
+SIGBUS if the file shrank). Writers therefore fill a brand-new versioned
+directory next to the target and then point the target path, a symlink,
+at it with a single os.replace. Readers resolve the symlink once and read
+every file from that version; older versions stay intact for as long as
+they are mapped, and only the newest few are kept on disk (removing a
+directory does not disturb existing mappings).
+
+Where symlinks cannot be created (Windows without the symlink privilege)
+the current version is named in a small pointer file next to the target
+instead ({path}.current), replaced just as atomically; resolve() reads it.
+"""
+import os
+import shutil
+import tempfile
+import time
+
+# Versions kept besides the current one, for readers that resolved the old
+# path but have not opened its files yet
+KEEP_VERSIONS = 2
+
+# Suffix of the pointer file used when the target cannot be a symlink
+POINTER_SUFFIX = '.current'
+
+
+def new_version_dir(path):
+    """Create an empty versioned directory next to path (e.g. models.20260101120000.abcd)"""
+    parent, name = os.path.split(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    version_dir = tempfile.mkdtemp(prefix=f"{name}.{time.strftime('%Y%m%d%H%M%S')}.", dir=parent)
+    os.chmod(version_dir, 0o755)
+    return version_dir
+
+
+def resolve(path):
+    """The version directory path currently points at (path itself for a plain directory)"""
+    path = os.path.abspath(path)
+    pointer = path + POINTER_SUFFIX
+    if not os.path.lexists(path) and os.path.exists(pointer):
+        with open(pointer) as f:
+            return os.path.join(os.path.dirname(path), f.read().strip())
+    return os.path.realpath(path)
+
+
+def _point_to(path, version_dir):
+    """Switch path to version_dir: a symlink if possible, else the pointer file"""
+    link_tmp = f'{path}.{os.getpid()}.link'
+    try:
+        os.symlink(os.path.basename(version_dir), link_tmp, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pointer_tmp = f'{path}{POINTER_SUFFIX}.{os.getpid()}.tmp'
+        with open(pointer_tmp, 'w') as f:
+            f.write(os.path.basename(version_dir))
+        os.replace(pointer_tmp, path + POINTER_SUFFIX)
+        return
+    os.replace(link_tmp, path)
+    if os.path.exists(path + POINTER_SUFFIX):
+        os.remove(path + POINTER_SUFFIX)
+
+
+def publish(path, version_dir, keep=KEEP_VERSIONS):
+    """Atomically point path at version_dir and prune old versions"""
+    path = os.path.abspath(path)
+    parent, name = os.path.split(path)
+    if os.path.isdir(path) and not os.path.islink(path):
+        # Directory written in place by an older version: move it aside once
+        # (renaming keeps existing mappings valid), or drop it if empty
+        if os.listdir(path):
+            aside = new_version_dir(path)
+            os.rmdir(aside)
+            os.rename(path, aside)
+        else:
+            os.rmdir(path)
+
+    _point_to(path, version_dir)
+
+    current = os.path.basename(version_dir)
+    versions = sorted(
+        (entry for entry in os.listdir(parent)
+         if entry.startswith(f'{name}.') and entry != current and not entry.endswith('.link')
+         and os.path.isdir(os.path.join(parent, entry))),
+        key=lambda entry: os.path.getmtime(os.path.join(parent, entry))
+    )
+    for entry in versions[:max(0, len(versions) - keep)]:
+        shutil.rmtree(os.path.join(parent, entry), ignore_errors=True)
+    return version_dir
+
+
+def unpublish(path):
+    """Remove path's symlink, pointer file or plain directory (versions are pruned by the next publish)"""
+    path = os.path.abspath(path)
+    if os.path.islink(path):
+        os.remove(path)
+    elif os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    if os.path.exists(path + POINTER_SUFFIX):
+        os.remove(path + POINTER_SUFFIX)
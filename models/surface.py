@@ -0,0 +1,240 @@
+"""
+Precomputed prediction surface for the dashboard's bounded input space.
+
+The dashboard only accepts known crops and seasons, areas of 1-1000 and
+years 2000-2030 (see create_filters). build_surface() evaluates the live
+models once over a dense crop x season x year x area grid and stores the
+predictions (with their interval bounds) as one float32 array next to the
+model artifact. Serving then reads inputs that fall exactly on a grid point
+(whole years, areas on the SURFACE_AREA_STEP grid, which is what the
+dashboard sends) from that array instead of running the models; every other
+input still goes to the live models. Interpolating between grid points is
+not used: tree models are step functions of area, so the interpolated values
+were off by up to a third of the live prediction.
+
+The error against the live models on random grid inputs is recorded with the
+surface, and a surface whose relative error exceeds
+SURFACE_MAX_RELATIVE_ERROR is refused at load time. The surface is tied to the
+artifact it was built from and ignored once the models are retrained. Its
+values file gets a new name on every save and the metadata naming it is
+replaced last, so workers mapping an older surface are never affected.
+
+The surface is optional (train_models.py --surface). Its size grows with
+crops x seasons x years x areas, so a grid above SURFACE_MAX_POINTS is not
+built.
+
+    python -m models.surface          # build for the saved artifact
+"""
+import hashlib
+import os
+import pickle
+import time
+
+import numpy as np
+
+from models.publish import resolve
+
+SURFACE_VALUES_PREFIX = 'surface.'
+SURFACE_META_FILE = 'surface.pkl'
+# Distance from a grid point, in grid steps, still treated as on the grid
+GRID_TOLERANCE = 1e-6
+
+
+def models_version(artifact_dir):
+    """Digest of the artifact manifest; a surface is only valid for this version"""
+    with open(os.path.join(artifact_dir, 'manifest.pkl'), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+class PredictionSurface:
+    """Exact lookups in a (target, crop, season, year, area) float32 grid"""
+
+    def __init__(self, values, meta):
+        self.values = values
+        self.meta = meta
+        self.year_start, self.year_step = meta['year_start'], meta['year_step']
+        self.area_start, self.area_step = meta['area_start'], meta['area_step']
+        self.n_years, self.n_areas = values.shape[3], values.shape[4]
+        self.year_stop = self.year_start + self.year_step * (self.n_years - 1)
+        self.area_stop = self.area_start + self.area_step * (self.n_areas - 1)
+
+    def _positions(self, year_normalized, area):
+        """Fractional grid positions of the inputs along the year and area axes"""
+        year_pos = (np.asarray(year_normalized, dtype=float) - self.year_start) / self.year_step
+        area_pos = (np.asarray(area, dtype=float) - self.area_start) / self.area_step
+        return year_pos, area_pos
+
+    def covers(self, year_normalized, area):
+        """Boolean mask of inputs that fall on a grid point"""
+        year_pos, area_pos = self._positions(year_normalized, area)
+        return ((year_pos >= -GRID_TOLERANCE) & (year_pos <= self.n_years - 1 + GRID_TOLERANCE) &
+                (area_pos >= -GRID_TOLERANCE) & (area_pos <= self.n_areas - 1 + GRID_TOLERANCE) &
+                (np.abs(year_pos - np.round(year_pos)) <= GRID_TOLERANCE) &
+                (np.abs(area_pos - np.round(area_pos)) <= GRID_TOLERANCE))
+
+    def lookup(self, crop_codes, season_codes, year_normalized, area):
+        """Stored (yield, production, ...) for inputs on the grid (see covers)"""
+        crop_codes = np.asarray(crop_codes, dtype=np.intp)
+        season_codes = np.asarray(season_codes, dtype=np.intp)
+        year_pos, area_pos = self._positions(year_normalized, area)
+        iy = np.clip(np.round(year_pos).astype(np.intp), 0, self.n_years - 1)
+        ia = np.clip(np.round(area_pos).astype(np.intp), 0, self.n_areas - 1)
+        result = self.values[:, crop_codes, season_codes, iy, ia]
+        return {name: result[i].astype(float) for i, name in enumerate(self.meta['targets'])}
+
+
+def grid_points(predictor, year_range=None, area_range=None, area_step=None):
+    """Number of (crop, season, year, area) points the surface grid would have"""
+    config = predictor.config
+    year_range = year_range or config.SURFACE_YEAR_RANGE
+    area_range = area_range or config.SURFACE_AREA_RANGE
+    area_step = area_step or config.SURFACE_AREA_STEP
+    n_areas = len(np.arange(area_range[0], area_range[1] + area_step / 2, area_step))
+    return (len(predictor.models['crop_encoder'].classes_) * len(predictor.models['season_encoder'].classes_) *
+            (year_range[1] - year_range[0] + 1) * n_areas)
+
+
+def build_surface(predictor, year_range=None, area_range=None, area_step=None,
+                  n_check=20000, chunk_rows=100000):
+    """Evaluate the predictor's live models over the grid and measure the lookup error
+
+    Returns (values, meta). Years are whole years, areas run from area_range[0]
+    to area_range[1] in area_step increments.
+    """
+    config = predictor.config
+    year_range = year_range or config.SURFACE_YEAR_RANGE
+    area_range = area_range or config.SURFACE_AREA_RANGE
+    area_step = area_step or config.SURFACE_AREA_STEP
+    baseline_year = predictor.models.get('baseline_year', 2015)
+
+    n_crops = len(predictor.models['crop_encoder'].classes_)
+    n_seasons = len(predictor.models['season_encoder'].classes_)
+    years = np.arange(year_range[0], year_range[1] + 1, dtype=float) - baseline_year
+    areas = np.arange(area_range[0], area_range[1] + area_step / 2, area_step, dtype=float)
+
+    start = time.perf_counter()
+    grid = np.stack(np.meshgrid(np.arange(n_crops), np.arange(n_seasons), areas, years, indexing='ij'), axis=-1)
+    # (crop, season, area, year) order matches the model's feature columns
+    features = grid.reshape(-1, 4)
+    predictions = targets = None
+    for lo in range(0, len(features), chunk_rows):
+        chunk = predictor._score_features(features[lo:lo + chunk_rows], 'surface')
+        if predictions is None:
+            # Point predictions plus any interval bounds the models provide
+            targets = tuple(chunk)
+            predictions = np.empty((len(targets), len(features)), dtype=np.float32)
+        for i, name in enumerate(targets):
+            predictions[i, lo:lo + len(chunk[name])] = chunk[name]
+    values = predictions.reshape(len(targets), n_crops, n_seasons, len(areas), len(years)).transpose(0, 1, 2, 4, 3)
+    values = np.ascontiguousarray(values)
+    build_seconds = time.perf_counter() - start
+
+    meta = {
+        'targets': targets,
+        'engine': predictor.engine,
+        'year_start': float(years[0]), 'year_step': 1.0,
+        'area_start': float(areas[0]), 'area_step': float(area_step),
+        'build_seconds': round(build_seconds, 2),
+        'grid_points': int(len(features))
+    }
+    surface = PredictionSurface(values, meta)
+
+    # Error against the live models on random grid inputs, the only ones served from the surface
+    rng = np.random.RandomState(42)
+    check = np.column_stack([
+        rng.randint(0, n_crops, n_check), rng.randint(0, n_seasons, n_check),
+        rng.choice(areas, n_check), rng.choice(years, n_check)
+    ]).astype(float)
+    live = predictor._score_features(check, 'surface')
+    looked_up = surface.lookup(check[:, 0], check[:, 1], check[:, 3], check[:, 2])
+    meta['max_error'] = {}
+    for name in targets:
+        error = np.abs(looked_up[name] - live[name])
+        meta['max_error'][name] = {
+            'abs': float(error.max()),
+            'p99_abs': float(np.percentile(error, 99)),
+            'relative': float((error / np.maximum(np.abs(live[name]), 1.0)).max())
+        }
+    return values, meta
+
+
+def save_surface(values, meta, artifact_dir):
+    """Write the surface next to the artifact it was built from"""
+    artifact_dir = resolve(artifact_dir)
+    values_file = f'{SURFACE_VALUES_PREFIX}{time.time_ns()}.{os.getpid()}.npy'
+    meta = dict(meta, models_version=models_version(artifact_dir), values_file=values_file)
+    np.save(os.path.join(artifact_dir, values_file), values.astype(np.float32))
+    meta_path = os.path.join(artifact_dir, SURFACE_META_FILE)
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, meta_path)
+    # Older values files are unlinked, never rewritten, so existing mappings stay valid
+    for entry in os.listdir(artifact_dir):
+        if entry.startswith(SURFACE_VALUES_PREFIX) and entry.endswith('.npy') and entry != values_file:
+            os.remove(os.path.join(artifact_dir, entry))
+
+
+def surface_error(meta):
+    """Largest relative error of any target recorded with the surface"""
+    return max((error['relative'] for error in meta.get('max_error', {}).values()), default=float('inf'))
+
+
+def load_surface(artifact_dir, engine='model', max_relative_error=None):
+    """Load a memory-mapped surface, or None if missing, stale, built for another
+    engine or less accurate than max_relative_error"""
+    artifact_dir = resolve(artifact_dir)
+    meta_path = os.path.join(artifact_dir, SURFACE_META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'rb') as f:
+        meta = pickle.load(f)
+    if meta.get('models_version') != models_version(artifact_dir):
+        print("⚠️ Prediction surface is older than the models; rebuild it with `python -m models.surface`")
+        return None
+    if meta.get('engine') != engine:
+        return None
+    if max_relative_error is not None and surface_error(meta) > max_relative_error:
+        print(f"⚠️ Prediction surface error {surface_error(meta):.2%} exceeds the "
+              f"{max_relative_error:.2%} tolerance; serving from the live models")
+        return None
+    values = np.load(os.path.join(artifact_dir, meta.get('values_file', 'surface.npy')), mmap_mode='r')
+    return PredictionSurface(values, meta)
+
+
+def build_and_save(predictor=None):
+    """Build the surface for the saved artifact and print the recorded error (None when over budget)"""
+    from models.artifact import artifact_exists
+    from models.predictor import CropPredictor
+
+    predictor = predictor or CropPredictor(cache_size=0, micro_batch=False)
+    if not predictor.models:
+        raise RuntimeError('No models loaded; train models first')
+    artifact_dir = predictor.config.MODEL_ARTIFACT_DIR
+    if not artifact_exists(artifact_dir):
+        raise RuntimeError('The surface is stored with the model artifact; save models first')
+    n_points = grid_points(predictor)
+    if n_points > predictor.config.SURFACE_MAX_POINTS:
+        print(f"⚠️ Prediction surface skipped: {n_points} grid points exceed SURFACE_MAX_POINTS "
+              f"({predictor.config.SURFACE_MAX_POINTS}); predictions use the live models")
+        return None
+    values, meta = build_surface(predictor)
+    save_surface(values, meta, artifact_dir)
+    print(f"✅ Prediction surface saved to {artifact_dir} "
+          f"({meta['grid_points']} points, {values.nbytes / 1e6:.1f} MB, {meta['build_seconds']}s)")
+    for name, error in meta['max_error'].items():
+        print(f"  - {name}: max error {error['abs']:.4f} (p99 {error['p99_abs']:.4f}, "
+              f"relative {error['relative']:.2%})")
+    tolerance = predictor.config.SURFACE_MAX_RELATIVE_ERROR
+    if surface_error(meta) > tolerance:
+        print(f"⚠️ Error exceeds SURFACE_MAX_RELATIVE_ERROR ({tolerance:.2%}); the surface will not be served")
+    return meta
+
+
+if __name__ == '__main__':
+    import sys
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from models.surface import build_and_save
+
+    build_and_save()
@@ -0,0 +1,127 @@
+"""
+Per-(Crop, Season) linear trend models fitted in one batched solve.
+
+Every crop x season series gets its own ``target ~ Year_normalized + Area``
+regression. Rows are scattered into a zero-padded (groups, rows, features)
+array, centred per group, and all groups' normal equations are solved with a
+single batched ``np.linalg.solve``, so fitting thousands of series is one
+numpy call rather than a Python loop. A small scale-relative ridge keeps
+constant columns solvable.
+
+The result is a dense coefficient table indexed by (crop code, season code),
+so serving a prediction is one array lookup. A few points fit a line almost
+exactly and extrapolate wildly, so crop x season pairs with fewer than
+min_rows rows (or none) fall back to the crop's pooled trend across seasons,
+and to the trend over all crops when the crop itself is that short. Crops
+without any data stay NaN.
+"""
+import numpy as np
+
+# Columns of the coefficient table
+TREND_TERMS = ('intercept', 'year', 'area')
+
+
+def fit_grouped_trends(groups, n_groups, design, targets, ridge=1e-6):
+    """Fit target ~ design separately for every group in one batched solve
+
+    groups: (n_rows,) int group ids in [0, n_groups); design: (n_rows, k)
+    features; targets: (n_rows, n_targets). Returns (coef, counts) with coef
+    of shape (n_groups, 1 + k, n_targets) ordered intercept first; groups
+    without rows get NaN.
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    design = np.asarray(design, dtype=np.float64)
+    targets = np.asarray(targets, dtype=np.float64).reshape(len(groups), -1)
+    n_features, n_targets = design.shape[1], targets.shape[1]
+
+    counts = np.bincount(groups, minlength=n_groups)
+    order = np.argsort(groups, kind='stable')
+    sorted_groups = groups[order]
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    position = np.arange(len(groups)) - starts[sorted_groups]
+
+    # Padded (group, row, column) arrays; padding rows stay zero after centring
+    width = max(int(counts.max(initial=0)), 1)
+    X = np.zeros((n_groups, width, n_features))
+    Y = np.zeros((n_groups, width, n_targets))
+    mask = np.zeros((n_groups, width, 1))
+    X[sorted_groups, position] = design[order]
+    Y[sorted_groups, position] = targets[order]
+    mask[sorted_groups, position] = 1.0
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        safe_counts = np.maximum(counts, 1)[:, None]
+        x_mean = X.sum(axis=1) / safe_counts
+        y_mean = Y.sum(axis=1) / safe_counts
+    X = (X - x_mean[:, None, :]) * mask
+    Y = (Y - y_mean[:, None, :]) * mask
+
+    gram = np.einsum('gnk,gnl->gkl', X, X)
+    cross = np.einsum('gnk,gnt->gkt', X, Y)
+    # Ridge relative to each column's spread (+ tiny floor for constant columns)
+    diagonal = np.einsum('gkk->gk', gram)
+    gram[:, np.arange(n_features), np.arange(n_features)] += ridge * diagonal + 1e-12
+    slopes = np.linalg.solve(gram, cross)
+
+    intercept = y_mean - np.einsum('gk,gkt->gt', x_mean, slopes)
+    coef = np.concatenate([intercept[:, None, :], slopes], axis=1)
+    coef[counts == 0] = np.nan
+    return coef, counts
+
+
+class TrendModelTable:
+    """Dense (crop, season) -> coefficient table; numpy-only, so it can live in the artifact"""
+
+    def __init__(self, coef, counts, targets, min_rows=1):
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.counts = np.asarray(counts, dtype=np.int32)
+        self.targets = tuple(targets)
+        self.min_rows = min_rows
+
+    @classmethod
+    def fit(cls, crop_codes, season_codes, year_normalized, area, targets, n_crops, n_seasons, ridge=1e-6,
+            min_rows=5):
+        """Fit every crop x season series (crop, then global fallback for short series)
+
+        targets maps a target name to a 1-D array aligned with the inputs; rows
+        with a missing target are ignored for that target only.
+        """
+        crop_codes = np.asarray(crop_codes, dtype=np.int64)
+        season_codes = np.asarray(season_codes, dtype=np.int64)
+        design = np.column_stack([year_normalized, area]).astype(np.float64)
+
+        n_terms = 1 + design.shape[1]
+        coef = np.full((n_crops, n_seasons, n_terms, len(targets)), np.nan)
+        counts = np.zeros((n_crops, n_seasons, len(targets)), dtype=np.int32)
+        for t, values in enumerate(targets.values()):
+            values = np.asarray(values, dtype=np.float64)
+            keep = ~np.isnan(values) & ~np.isnan(design).any(axis=1)
+            pair_coef, pair_counts = fit_grouped_trends(
+                crop_codes[keep] * n_seasons + season_codes[keep], n_crops * n_seasons,
+                design[keep], values[keep], ridge)
+            crop_coef, crop_counts = fit_grouped_trends(crop_codes[keep], n_crops, design[keep], values[keep],
+                                                        ridge)
+            global_coef, _ = fit_grouped_trends(np.zeros(keep.sum(), dtype=np.int64), 1, design[keep],
+                                                values[keep], ridge)
+
+            # Short crops take the global trend; crops without data stay NaN
+            short_crops = (crop_counts > 0) & (crop_counts < min_rows)
+            crop_coef[short_crops] = global_coef[0]
+            pair_coef = pair_coef.reshape(n_crops, n_seasons, n_terms)
+            short = pair_counts.reshape(n_crops, n_seasons) < min_rows
+            pair_coef[short] = np.broadcast_to(crop_coef[:, None, :, 0], pair_coef.shape)[short]
+            coef[..., t] = pair_coef
+            counts[..., t] = pair_counts.reshape(n_crops, n_seasons)
+        return cls(coef, counts, targets.keys(), min_rows)
+
+    def predict(self, crop_codes, season_codes, year_normalized, area):
+        """Return (n_rows, n_targets) predictions; NaN where a crop has no data at all"""
+        coef = self.coef[np.asarray(crop_codes), np.asarray(season_codes)]
+        year_normalized = np.asarray(year_normalized, dtype=np.float64)[:, None]
+        area = np.asarray(area, dtype=np.float64)[:, None]
+        return coef[:, 0] + coef[:, 1] * year_normalized + coef[:, 2] * area
+
+    def coverage(self):
+        """Share of crop x season pairs that have their own fit, per target"""
+        min_rows = max(getattr(self, 'min_rows', 1), 1)
+        return {name: float((self.counts[..., t] >= min_rows).mean()) for t, name in enumerate(self.targets)}
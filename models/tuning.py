@@ -0,0 +1,184 @@
+"""
+Hyperparameter search with rolling-origin cross-validation.
+
+Folds follow time: for each of the last ``n_folds`` years t+1 a candidate is
+trained on every row from years <= t and scored on year t+1, so no future
+year ever leaks into training. Candidates from PARAM_GRIDS are narrowed by
+successive halving where the resource is the number of folds: every rung
+scores the survivors on more folds (newest first) and keeps the best
+1/factor of them.
+
+Each (model, params, fold, data) score is memoized on disk, so a rerun after
+a small grid change only fits the new combinations. Uncached folds of a rung
+run in parallel in a process pool.
+"""
+import hashlib
+import math
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
+from sklearn.model_selection import ParameterGrid
+from sklearn.preprocessing import StandardScaler
+
+# Search space per candidate family (an empty grid is a single default config)
+PARAM_GRIDS = {
+    'Linear Regression': {},
+    'Random Forest': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [None, 10, 20],
+        'min_samples_leaf': [1, 2, 5]
+    },
+    'Gradient Boosting': {
+        'n_estimators': [100, 200, 400],
+        'learning_rate': [0.05, 0.1, 0.2],
+        'max_depth': [2, 3, 4]
+    }
+}
+
+
+def rolling_origin_folds(years, n_folds=4, min_train_years=2):
+    """Return [(test_year, train_mask, test_mask), ...] for the newest n_folds years, newest first"""
+    years = np.asarray(years)
+    distinct = np.unique(years)
+    test_years = distinct[min_train_years:][-n_folds:]
+    if len(test_years) == 0:
+        raise ValueError(f"Need more than {min_train_years} distinct years for rolling-origin folds")
+    return [(int(year), years < year, years == year) for year in test_years[::-1]]
+
+
+def data_fingerprint(X, y):
+    """Short digest of the training data; part of every fold cache key"""
+    digest = hashlib.sha256()
+    for array in (np.ascontiguousarray(X, dtype=np.float64), np.ascontiguousarray(y, dtype=np.float64)):
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()[:16]
+
+
+class FoldCache:
+    """One pickle per fold result, keyed by model, params, fold and data"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(name, params, fold_year, fingerprint):
+        text = repr((name, sorted(params.items()), fold_year, fingerprint))
+        return hashlib.sha256(text.encode()).hexdigest()[:24]
+
+    def get(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(os.path.join(self.cache_dir, f'{key}.pkl'), 'rb') as f:
+                result = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        if not self.cache_dir:
+            return
+        path = os.path.join(self.cache_dir, f'{key}.pkl')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+
+def _score_fold(name, params, X_train, y_train, X_test, y_test):
+    """Fit one candidate on one fold and score it (runs in worker processes)"""
+    from models.model_trainer import build_model, residual_quantiles
+
+    start = time.perf_counter()
+    scaler = StandardScaler()
+    model = build_model(name, params=params)
+    model.fit(scaler.fit_transform(X_train), y_train)
+    y_pred = model.predict(scaler.transform(X_test))
+    return {
+        'residual_quantiles': residual_quantiles(y_test, y_pred),
+        'rmse': float(np.sqrt(mean_squared_error(y_test, y_pred))),
+        'r2': float(r2_score(y_test, y_pred)) if len(y_test) > 1 else float('nan'),
+        'mae': float(mean_absolute_error(y_test, y_pred)),
+        'fit_seconds': time.perf_counter() - start
+    }
+
+
+def tune_target(X, y, years, n_folds=4, factor=3, n_jobs=1, cache_dir=None, grids=None, label=''):
+    """Successive-halving search for one target
+
+    Returns the candidates of the final rung sorted best first, as dicts with
+    model, params, folds (number scored), cv_rmse, cv_r2 and cv_mae, plus the
+    FoldCache used (for hit/miss counts).
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    folds = rolling_origin_folds(years, n_folds)
+    fingerprint = data_fingerprint(X, y)
+    cache = FoldCache(cache_dir)
+    grids = PARAM_GRIDS if grids is None else grids
+
+    candidates = [(name, dict(params)) for name, grid in grids.items() for params in ParameterGrid(grid)]
+    scores = {}
+    n_jobs = (os.cpu_count() or 1) if n_jobs in (None, -1) else max(1, n_jobs)
+    pool = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+
+    try:
+        n_rung_folds = 1
+        while True:
+            rung_folds = folds[:n_rung_folds]
+            keys = {}
+            pending = {}
+            for index, (name, params) in enumerate(candidates):
+                for fold_year, train_mask, test_mask in rung_folds:
+                    key = keys[(index, fold_year)] = FoldCache.key(name, params, fold_year, fingerprint)
+                    if key in scores or key in pending:
+                        continue
+                    cached = cache.get(key)
+                    if cached is not None:
+                        scores[key] = cached
+                        continue
+                    args = (name, params, X[train_mask], y[train_mask], X[test_mask], y[test_mask])
+                    pending[key] = pool.submit(_score_fold, *args) if pool else args
+
+            for key, task in pending.items():
+                scores[key] = task.result() if pool else _score_fold(*task)
+                cache.put(key, scores[key])
+
+            ranked = []
+            for index, (name, params) in enumerate(candidates):
+                fold_scores = [scores[keys[(index, fold_year)]] for fold_year, _, _ in rung_folds]
+                ranked.append({
+                    'model': name,
+                    'params': params,
+                    'folds': len(fold_scores),
+                    'cv_rmse': float(np.mean([s['rmse'] for s in fold_scores])),
+                    'cv_r2': float(np.nanmean([s['r2'] for s in fold_scores])),
+                    'cv_mae': float(np.mean([s['mae'] for s in fold_scores])),
+                    # Band for serving: fold residual quantiles averaged (None for pre-interval cache entries)
+                    'residual_quantiles': (tuple(float(q) for q in np.mean([s['residual_quantiles'] for s in fold_scores], axis=0))
+                                           if all('residual_quantiles' in s for s in fold_scores) else None)
+                })
+            ranked.sort(key=lambda r: r['cv_rmse'])
+
+            print(f"  - {label}{len(candidates)} candidates on {n_rung_folds} fold(s): "
+                  f"fitted {len(pending)}, best RMSE {ranked[0]['cv_rmse']:.4f}")
+            if len(candidates) == 1 or (n_rung_folds == len(folds) and len(candidates) <= factor):
+                return ranked, cache
+
+            keep = max(1, math.ceil(len(candidates) / factor))
+            candidates = [(r['model'], r['params']) for r in ranked[:keep]]
+            n_rung_folds = min(len(folds), n_rung_folds * factor)
+    finally:
+        if pool:
+            pool.shutdown()
@@ -4,10 +4,8 @@ Main script to run the crop prediction dashboard
 """
 import os
 import sys
-from models.data_processor import DataProcessor
-from models.model_trainer import ModelTrainer
-from models.predictor import CropPredictor
 from config import Config
+from models.artifact import artifact_exists
 
 def setup_project():
     """Setup the project by training models if needed"""
@@ -18,9 +16,13 @@ def setup_project():
     os.makedirs(config.PROCESSED_DATA_DIR, exist_ok=True)
     
     # Check if models exist
-    if not os.path.exists(config.MODEL_FILE):
+    if not (os.path.exists(config.MODEL_FILE) or artifact_exists(config.MODEL_ARTIFACT_DIR)):
         print("Models not found. Training new models...")
         
+        # The training stack (scikit-learn) is only imported when training runs
+        from models.data_processor import DataProcessor
+        from models.model_trainer import ModelTrainer
+        
         # Process data
         processor = DataProcessor()
         merged_df = processor.load_and_process_data()
@@ -49,8 +51,23 @@ def setup_project():
 # -----------------------------
 # ✅ Expose app + server for Gunicorn
 # -----------------------------
-from dashboard.app import app
-server = app.server   # This is what Gunicorn will run
+def __getattr__(name):
+    """Import the Dash app on first access to `app` / `server` (e.g. gunicorn run_dashboard:server)"""
+    if name in ('app', 'server'):
+        from dashboard.app import app
+        return app if name == 'app' else app.server   # server is what Gunicorn will run
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def create_server():
+    """App factory for Gunicorn (see gunicorn.conf.py)
+    
+    With preload_app this runs once in the master: models and data are loaded
+    and the chart cache is warmed before workers are forked, so every worker
+    shares those pages copy-on-write instead of loading its own copy.
+    """
+    from dashboard.app import app, warm_up
+    warm_up()
+    return app.server
 
 def main():
     """Main function to run the dashboard"""
@@ -61,6 +78,8 @@ def main():
         print("❌ Setup failed. Exiting.")
         sys.exit(1)
     
+    from dashboard.app import app
+    
     config = Config()
     print(f"🚀 Dashboard starting at http://{config.HOST}:{config.PORT}")
     
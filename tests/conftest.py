@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'benchmarks'))
+
+from run_benchmarks import make_processor, quiet, write_synthetic_raw  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def trained():
+    """A small synthetic dataset, processed and trained once: (processor, merged_df, trainer)"""
+    from models.model_trainer import ModelTrainer
+
+    raw_dir = tempfile.mkdtemp()
+    write_synthetic_raw(raw_dir, n_crops=6, n_seasons=3, n_years=10)
+    processor = make_processor(raw_dir, tempfile.mkdtemp())
+    with quiet():
+        merged_df = processor.load_and_process_data(force=True)
+        trainer = ModelTrainer(processor)
+        trainer.train_models(*processor.prepare_features(merged_df))
+    return processor, merged_df, trainer
+
+
+@pytest.fixture
+def no_symlinks(monkeypatch):
+    """Make os.symlink fail as it does on Windows without the symlink privilege"""
+    def symlink(*args, **kwargs):
+        raise OSError(1314, 'A required privilege is not held by the client')
+    monkeypatch.setattr(os, 'symlink', symlink)
+
+
+@pytest.fixture
+def model_dir(monkeypatch, tmp_path):
+    """Point the saved model paths at a temporary directory"""
+    from config import Config
+
+    monkeypatch.setattr(Config, 'MODEL_DIR', str(tmp_path))
+    monkeypatch.setattr(Config, 'MODEL_FILE', str(tmp_path / 'crop_prediction_models.pkl'))
+    monkeypatch.setattr(Config, 'MODEL_ARTIFACT_DIR', str(tmp_path / 'crop_prediction_models'))
+    return tmp_path
+
+
+@pytest.fixture
+def saved_models(trained, model_dir):
+    """Save the trained models to the temporary model directory"""
+    _, _, trainer = trained
+    with quiet():
+        trainer.save_models()
+    return trainer
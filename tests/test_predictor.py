@@ -0,0 +1,49 @@
+import pytest
+
+from dashboard.components.predictions import format_interval
+from models.predictor import CropPredictor
+from run_benchmarks import quiet
+
+
+def make_predictor(**kwargs):
+    with quiet():
+        return CropPredictor(**kwargs)
+
+
+@pytest.mark.parametrize('micro_batch', [False, True])
+def test_single_prediction_carries_interval_coverage(trained, saved_models, micro_batch):
+    processor, _, _ = trained
+    crop, season = processor.le_crop.classes_[0], processor.le_season.classes_[0]
+    predictor = make_predictor(cache_size=0, micro_batch=micro_batch)
+    assert (predictor.batcher is not None) == micro_batch
+
+    result = predictor.predict(crop, season, 100, 2020)
+    coverage = saved_models.intervals['yield']['coverage']
+    assert result['yield_coverage'] == coverage
+    assert result['production_coverage'] == saved_models.intervals['production']['coverage']
+    assert format_interval(result, 'yield').startswith(f"{coverage:.0%} range: ")
+
+    direct = make_predictor(cache_size=0, micro_batch=False).predict(crop, season, 100, 2020)
+    assert result == pytest.approx(direct)
+
+
+def test_batch_prediction_carries_interval_coverage(trained, saved_models):
+    processor, _, _ = trained
+    predictor = make_predictor(cache_size=0, micro_batch=False)
+    result = predictor.predict_batch(crop=[processor.le_crop.classes_[0], 'Unknown'],
+                                     season=[processor.le_season.classes_[0]] * 2,
+                                     area=[100, 100], year=[2020, 2020])
+    assert result['yield_coverage'].iloc[0] == saved_models.intervals['yield']['coverage']
+    assert result['yield_coverage'].isna().iloc[1]
+
+
+def test_cached_results_do_not_depend_on_input_types(trained, saved_models):
+    processor, _, _ = trained
+    crop, season = processor.le_crop.classes_[0], processor.le_season.classes_[0]
+    predictor = make_predictor(cache_size=100, micro_batch=False)
+    cold = make_predictor(cache_size=0, micro_batch=False)
+
+    assert 'error' in cold.predict(crop, season, 100, '2020')
+    assert 'error' not in predictor.predict(crop, season, 100, 2020)
+    assert 'error' in predictor.predict(crop, season, 100, '2020')
+    assert predictor.predict(crop, season, 100.0, 2020.0) == cold.predict(crop, season, 100.0, 2020.0)
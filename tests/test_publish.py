@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+
+from models.artifact import artifact_exists, load_artifact, save_artifact
+from models.data_store import ProcessedDataStore, remove_store, store_exists, write_store
+from models.publish import POINTER_SUFFIX, resolve
+from run_benchmarks import quiet
+
+
+def test_store_published_through_pointer_file_without_symlinks(trained, no_symlinks, tmp_path):
+    _, merged_df, _ = trained
+    store_dir = str(tmp_path / 'merged_store')
+    write_store(merged_df.head(10), store_dir)
+    assert not os.path.lexists(store_dir)
+    assert os.path.exists(store_dir + POINTER_SUFFIX)
+    assert store_exists(store_dir)
+
+    first = ProcessedDataStore(store_dir)
+    write_store(merged_df, store_dir)
+    second = ProcessedDataStore(store_dir)
+    assert first.manifest['n_rows'] == 10
+    assert second.manifest['n_rows'] == len(merged_df)
+    assert resolve(store_dir) == second.store_dir != first.store_dir
+
+    remove_store(store_dir)
+    assert not store_exists(store_dir)
+
+
+def test_artifact_published_through_pointer_file_without_symlinks(trained, no_symlinks, tmp_path):
+    processor, merged_df, trainer = trained
+    artifact_dir = str(tmp_path / 'models')
+    save_artifact(trainer.models_to_save(), artifact_dir)
+    assert artifact_exists(artifact_dir)
+
+    X = processor.prepare_features(merged_df)[0].to_numpy()[:20]
+    loaded = load_artifact(artifact_dir)
+    expected = np.asarray(trainer.models_to_save()['model'].predict(X))
+    np.testing.assert_allclose(np.asarray(loaded['model'].predict(X)), expected)
+
+    # A second save switches the pointer; the loaded version stays readable
+    save_artifact(trainer.models_to_save(), artifact_dir)
+    np.testing.assert_allclose(np.asarray(loaded['model'].predict(X)), expected)
+    assert os.path.isdir(resolve(artifact_dir))
+
+
+def test_saved_models_served_from_artifact_without_symlinks(trained, no_symlinks, model_dir, capsys):
+    from models.predictor import CropPredictor
+
+    _, _, trainer = trained
+    trainer.save_models()
+    predictor = CropPredictor(cache_size=0, micro_batch=False)
+    out = capsys.readouterr().out
+    assert 'Mappable artifact saved' in out
+    assert 'memory-mapped artifact' in out
+    assert predictor.models
+
+
+def test_processing_returns_when_store_cannot_be_written(trained, monkeypatch):
+    processor, _, _ = trained
+
+    def fail(*args, **kwargs):
+        raise OSError('store not writable')
+    monkeypatch.setattr('models.data_processor.write_store', fail)
+    with quiet():
+        merged_df = processor.load_and_process_data(force=True)
+    assert merged_df is not None and len(merged_df)
+    assert os.path.exists(os.path.join(processor.config.PROCESSED_DATA_DIR, processor.config.MERGED_FILE))
+    assert not store_exists(processor.config.PROCESSED_STORE_DIR)
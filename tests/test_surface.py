@@ -0,0 +1,16 @@
+import os
+
+from config import Config
+from models.predictor import CropPredictor
+from models.surface import SURFACE_META_FILE, build_and_save, grid_points
+from models.publish import resolve
+from run_benchmarks import quiet
+
+
+def test_surface_over_budget_is_not_built(saved_models, monkeypatch):
+    with quiet():
+        predictor = CropPredictor(cache_size=0, micro_batch=False)
+    monkeypatch.setattr(Config, 'SURFACE_MAX_POINTS', grid_points(predictor) - 1)
+    with quiet():
+        assert build_and_save(predictor) is None
+    assert not os.path.exists(os.path.join(resolve(Config.MODEL_ARTIFACT_DIR), SURFACE_META_FILE))
@@ -0,0 +1,42 @@
+import numpy as np
+
+from models.trend import TrendModelTable, fit_grouped_trends
+
+
+def make_series():
+    """Crop 0: a long clean trend in season 0 and three noisy rows in season 1;
+    crop 1: two rows in total; crop 2: no data"""
+    rng = np.random.RandomState(0)
+    years = np.arange(-10, 10, dtype=float)
+    crop = np.concatenate([np.zeros(20), np.zeros(3), np.ones(2)]).astype(int)
+    season = np.concatenate([np.zeros(20), np.ones(3), np.zeros(2)]).astype(int)
+    year = np.concatenate([years, [7.0, 8.0, 9.0], [0.0, 1.0]])
+    area = np.concatenate([rng.uniform(50, 150, 20), [10.0, 10.5, 9.0], [20.0, 30.0]])
+    value = 1000 + 20 * year + 0.5 * area
+    value[20:23] = [2700, 2300, 1900]
+    return crop, season, year, area, value
+
+
+def test_short_series_fall_back_to_pooled_trends():
+    crop, season, year, area, value = make_series()
+    table = TrendModelTable.fit(crop, season, year, area, {'yield': value}, n_crops=3, n_seasons=2, min_rows=5)
+
+    design = np.column_stack([year, area])
+    crop_coef, _ = fit_grouped_trends(crop[crop == 0], 3, design[crop == 0], value[crop == 0])
+    global_coef, _ = fit_grouped_trends(np.zeros(len(crop), dtype=int), 1, design, value)
+    np.testing.assert_allclose(table.coef[0, 1, :, 0], crop_coef[0, :, 0])
+    np.testing.assert_allclose(table.coef[1, 0, :, 0], global_coef[0, :, 0])
+    assert np.isnan(table.coef[2]).all()
+    assert table.coverage()['yield'] == 1 / 6
+
+    # The three-row series no longer extrapolates its own near-exact fit
+    served_years = np.arange(-15, 16, dtype=float)
+    predictions = table.predict(np.zeros(31, dtype=int), np.ones(31, dtype=int), served_years, np.full(31, 10.0))
+    assert (predictions > 0).all()
+
+
+def test_series_at_min_rows_keep_their_own_fit():
+    crop, season, year, area, value = make_series()
+    table = TrendModelTable.fit(crop, season, year, area, {'yield': value}, n_crops=3, n_seasons=2, min_rows=3)
+    own, _ = fit_grouped_trends(np.zeros(3, dtype=int), 1, np.column_stack([year, area])[20:23], value[20:23])
+    np.testing.assert_allclose(table.coef[0, 1, :, 0], own[0, :, 0])
@@ -2,17 +2,40 @@
 """
 Script to manually train and save models
 """
+import argparse
+import pandas as pd
 from models.data_processor import DataProcessor
 from models.model_trainer import ModelTrainer
 
-def train_models():
-    """Train and save models"""
+# Columns prepare_features needs; a streamed table is only read back for these
+MODEL_COLUMNS = ['Crop_encoded', 'Season_encoded', 'Area', 'Year_normalized', 'Yield', 'Production']
+
+def train_models(n_jobs=1, raw_sources=None, tag_pattern=None, tune=False, surface=False, multi_output=True,
+                 stream=False):
+    """Train and save models
+    
+    raw_sources (globs or a manifest) switches from the three default raw
+    files to DataProcessor.load_and_process_files. tune=True replaces the
+    fixed candidates with the rolling-origin hyperparameter search.
+    surface=True also precomputes the prediction surface for the saved models
+    (skipped when the grid exceeds SURFACE_MAX_POINTS).
+    multi_output=False trains separate yield and production models instead
+    of one pipeline for both. stream=True processes the default raw files
+    with DataProcessor.stream_process_data (memory bounded by the chunk size)
+    and trains on the modelling columns of the resulting CSV.
+    """
     print("🚀 Starting Model Training...")
     print("=" * 50)
     
     # Process data
     processor = DataProcessor()
-    merged_df = processor.load_and_process_data()
+    if raw_sources:
+        merged_df = processor.load_and_process_files(raw_sources, tag_pattern=tag_pattern, n_jobs=n_jobs)
+    elif stream:
+        processed_path = processor.stream_process_data()
+        merged_df = pd.read_csv(processed_path, usecols=MODEL_COLUMNS) if processed_path else None
+    else:
+        merged_df = processor.load_and_process_data()
     
     if merged_df is not None:
         print("\n" + "="*50)
@@ -28,9 +51,14 @@ def train_models():
         
         # Train models
         trainer = ModelTrainer(processor)
-        yield_results, production_results = trainer.train_models(
-            X_yield, y_yield, X_production, y_production
-        )
+        if tune:
+            yield_results, production_results = trainer.tune_models(
+                X_yield, y_yield, X_production, y_production, n_jobs=n_jobs
+            )
+        else:
+            yield_results, production_results = trainer.train_models(
+                X_yield, y_yield, X_production, y_production, n_jobs=n_jobs, multi_output=multi_output
+            )
         
         print("\n" + "="*50)
         print("💾 SAVING MODELS")
@@ -39,6 +67,13 @@ def train_models():
         # Save models
         trainer.save_models()
         
+        if surface:
+            print("\n" + "="*50)
+            print("🗺️ BUILDING PREDICTION SURFACE")
+            print("="*50)
+            from models.surface import build_and_save
+            build_and_save()
+        
         print("\n" + "="*50)
         print("✅ TRAINING COMPLETE!")
         print("="*50)
@@ -48,4 +83,24 @@ def train_models():
         print("❌ Data processing failed. Cannot train models.")
 
 if __name__ == "__main__":
-    train_models()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train and save crop prediction models")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="parallel training processes/threads (-1 = all cores, default 1)")
+    parser.add_argument('--raw', nargs='+', metavar='GLOB_OR_MANIFEST',
+                        help="raw file globs or a .csv/.json manifest (default: the three All-India files)")
+    parser.add_argument('--tag-pattern',
+                        help="regex with named groups (e.g. (?P<State>...)) that tag globbed files")
+    parser.add_argument('--tune', action='store_true',
+                        help="search hyperparameters with rolling-origin CV (fold results cached on disk)")
+    parser.add_argument('--separate-models', action='store_true',
+                        help="fit separate yield and production models instead of one multi-output pipeline")
+    parser.add_argument('--surface', action='store_true',
+                        help="also precompute the prediction surface (python -m models.surface)")
+    parser.add_argument('--stream', action='store_true',
+                        help="process the raw files in chunks (DataProcessor.stream_process_data) for inputs too large for memory")
+    args = parser.parse_args()
+    if args.stream and args.raw:
+        parser.error("--stream processes the default raw files and cannot be combined with --raw")
+    raw = args.raw[0] if args.raw and len(args.raw) == 1 else args.raw
+    train_models(n_jobs=args.jobs, raw_sources=raw, tag_pattern=args.tag_pattern, tune=args.tune,
+                 surface=args.surface, multi_output=not args.separate_models, stream=args.stream)
\ No newline at end of file